@@ -0,0 +1,131 @@
+import contextvars
+import os
+import threading
+import unicodedata
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from sqlalchemy import bindparam, text
+
+# Máximo de entradas por mapa (tabla, clave); los catálogos más grandes se
+# cachean parcialmente y el resto se consulta por lote a medida que aparece
+ETL_CACHE_MAX = int(os.getenv("ETL_CACHE_MAX", "100000"))
+
+# Mapas que mantiene el cache: (tabla, columna clave). productos.id -> id
+# sirve para validar los producto_id que llegan en las líneas de factura
+CLAVES = (
+    ("clientes", "nombre_norm"),
+    ("proveedores", "nombre_norm"),
+    ("productos", "nombre_norm"),
+    ("productos", "sku"),
+    ("productos", "id"),
+)
+
+_cache = contextvars.ContextVar("cache_maestros", default=None)
+
+
+def plegar(valor):
+    """Clave de comparación equivalente a utf8mb4_unicode_ci.
+
+    Esa colación no distingue mayúsculas, acentos ni espacios finales: para
+    MySQL "José " y "jose" son el mismo nombre_norm (o sku). Los mapas y la
+    vuelta de las consultas usan esta clave, no el texto tal como vino.
+    """
+    if not isinstance(valor, str):
+        return valor
+    sin_acentos = "".join(c for c in unicodedata.normalize("NFKD", valor) if not unicodedata.combining(c))
+    return sin_acentos.casefold().rstrip(" ")
+
+
+class CacheMaestros:
+    """Cache de ids de maestros con alcance de una corrida del ETL.
+
+    Mantiene nombre_norm -> id para clientes, proveedores y productos y
+    sku -> id (y los id existentes) para productos, con claves plegadas
+    según la colación de la base (ver `plegar`). `precargar` los llena
+    una vez al inicio; los fallos se resuelven con una consulta IN por lote
+    y las altas de la corrida se registran con `registrar`. Cada mapa es un
+    LRU acotado a `max_entradas`. Los ausentes no se cachean: pueden darse
+    de alta más adelante en la misma corrida o desde la API.
+    """
+
+    def __init__(self, max_entradas=None):
+        self.max_entradas = max_entradas or ETL_CACHE_MAX
+        self._mapas = {clave: OrderedDict() for clave in CLAVES}
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def precargar(self, conn):
+        """Carga cada mapa con los registros más recientes, hasta el límite."""
+        for tabla, clave in CLAVES:
+            filas = conn.execute(text(f"""
+                SELECT {clave}, id FROM {tabla}
+                WHERE {clave} IS NOT NULL
+                ORDER BY id DESC
+                LIMIT :limite
+            """), {"limite": self.max_entradas}).fetchall()
+            # Los más recientes quedan al final: son los últimos en desalojarse
+            self.registrar(tabla, clave, reversed(filas))
+
+    def registrar(self, tabla, clave, pares):
+        mapa = self._mapas[(tabla, clave)]
+        with self._lock:
+            for valor, id_ in pares:
+                clave = plegar(valor)
+                mapa[clave] = id_
+                mapa.move_to_end(clave)
+            while len(mapa) > self.max_entradas:
+                mapa.popitem(last=False)
+
+    def resolver(self, conn, tabla, clave, valores):
+        """Mapa valor -> id de los `valores` que existen en `tabla`.
+
+        Las claves del resultado son los `valores` pedidos, no el texto que
+        devuelve MySQL: la comparación de la base ignora mayúsculas y
+        acentos, así que "ACME" puede volver como "acme".
+        """
+        mapa = self._mapas[(tabla, clave)]
+        encontrados = {}
+        faltan = {}
+        with self._lock:
+            for valor in set(valores):
+                plegado = plegar(valor)
+                if plegado in mapa:
+                    mapa.move_to_end(plegado)
+                    encontrados[valor] = mapa[plegado]
+                else:
+                    faltan.setdefault(plegado, []).append(valor)
+            self.aciertos += len(encontrados)
+            self.fallos += sum(len(pedidos) for pedidos in faltan.values())
+        if faltan:
+            stmt = text(f"SELECT {clave}, id FROM {tabla} WHERE {clave} IN :valores").bindparams(
+                bindparam("valores", expanding=True)
+            )
+            pedidos = [valor for grupo in faltan.values() for valor in grupo]
+            nuevos = conn.execute(stmt, {"valores": pedidos}).fetchall()
+            self.registrar(tabla, clave, nuevos)
+            for valor_db, id_ in nuevos:
+                for valor in faltan.get(plegar(valor_db), ()):
+                    encontrados[valor] = id_
+        return encontrados
+
+    def resumen(self):
+        return {
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "entradas": {f"{tabla}.{clave}": len(mapa) for (tabla, clave), mapa in self._mapas.items()},
+        }
+
+    @contextmanager
+    def activar(self):
+        token = _cache.set(self)
+        try:
+            yield self
+        finally:
+            _cache.reset(token)
+
+
+def actual():
+    """Cache de la corrida activa; fuera de una corrida, uno vacío de un solo uso."""
+    return _cache.get() or CacheMaestros()
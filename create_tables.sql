@@ -20,7 +20,18 @@ CREATE TABLE IF NOT EXISTS raw_data (
     monto DECIMAL(10,2),
     fecha DATETIME,
     creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-    tabla_destino VARCHAR(100)
+    tabla_destino VARCHAR(100),
+    metadata_json TEXT NULL,
+    actualizado_en DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    etl_estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+    etl_lease_owner VARCHAR(100) NULL,
+    etl_lease_expira DATETIME NULL,
+    lote_ingesta VARCHAR(32) NULL,
+    INDEX idx_raw_actualizado (actualizado_en),
+    INDEX idx_raw_etl_cola (etl_estado, id),
+    INDEX idx_raw_tipo_id (tipo, id),
+    INDEX idx_raw_fecha (fecha),
+    INDEX idx_raw_lote_ingesta (lote_ingesta)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS cleaned_data (
@@ -31,7 +42,9 @@ CREATE TABLE IF NOT EXISTS cleaned_data (
     fecha DATETIME,
     creado_en DATETIME,
     validado_por VARCHAR(100),
-    tabla_destino VARCHAR(100)
+    tabla_destino VARCHAR(100),
+    INDEX idx_cleaned_tipo_id (tipo, id),
+    INDEX idx_cleaned_fecha (fecha)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Facturas recurrentes: plantilla e instancias
@@ -41,7 +54,10 @@ CREATE TABLE IF NOT EXISTS facturas_recurrentes_template (
     descripcion TEXT,
     monto DECIMAL(10,2),
     frecuencia VARCHAR(50),
-    siguiente_generacion DATETIME
+    siguiente_generacion DATETIME,
+    raw_id INT,
+    CONSTRAINT uq_template_raw UNIQUE (raw_id),
+    CONSTRAINT fk_template_raw FOREIGN KEY (raw_id) REFERENCES raw_data(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS facturas_recurrentes_instance (
@@ -68,6 +84,8 @@ CREATE TABLE IF NOT EXISTS facturas_venta (
     creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     raw_id INT,
     CONSTRAINT uq_factura_venta_raw UNIQUE (raw_id),
+    INDEX idx_fv_cliente_id (cliente, id),
+    INDEX idx_fv_fecha (fecha),
     CONSTRAINT fk_factura_venta_raw FOREIGN KEY (raw_id) REFERENCES raw_data(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -80,6 +98,8 @@ CREATE TABLE IF NOT EXISTS facturas_compra (
     creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     raw_id INT,
     CONSTRAINT uq_factura_compra_raw UNIQUE (raw_id),
+    INDEX idx_fc_proveedor_id (proveedor, id),
+    INDEX idx_fc_fecha (fecha),
     CONSTRAINT fk_factura_compra_raw FOREIGN KEY (raw_id) REFERENCES raw_data(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -90,7 +110,12 @@ CREATE TABLE IF NOT EXISTS ordenes_compra (
     descripcion TEXT,
     monto DECIMAL(10,2),
     fecha DATE,
-    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    raw_id INT,
+    CONSTRAINT uq_orden_compra_raw UNIQUE (raw_id),
+    INDEX idx_oc_proveedor_id (proveedor, id),
+    INDEX idx_oc_fecha (fecha),
+    CONSTRAINT fk_orden_compra_raw FOREIGN KEY (raw_id) REFERENCES raw_data(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- Pagos recibidos (cliente paga factura de venta)
@@ -101,6 +126,8 @@ CREATE TABLE IF NOT EXISTS pagos_recibidos (
     fecha DATE,
     creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     raw_id INT,
+    CONSTRAINT uq_pago_recibido_raw UNIQUE (raw_id),
+    INDEX idx_pr_fecha (fecha),
     CONSTRAINT fk_pago_recibido_factura FOREIGN KEY (factura_venta_id) REFERENCES facturas_venta(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
@@ -113,6 +140,8 @@ CREATE TABLE IF NOT EXISTS pagos_proveedor (
     fecha DATE,
     creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     raw_id INT,
+    CONSTRAINT uq_pago_proveedor_raw UNIQUE (raw_id),
+    INDEX idx_pp_fecha (fecha),
     CONSTRAINT fk_pago_proveedor_factura FOREIGN KEY (factura_compra_id) REFERENCES facturas_compra(id) ON DELETE SET NULL,
     CONSTRAINT fk_pago_proveedor_orden FOREIGN KEY (orden_compra_id) REFERENCES ordenes_compra(id) ON DELETE SET NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -125,7 +154,9 @@ CREATE TABLE IF NOT EXISTS clientes (
     correo VARCHAR(150),
     telefono VARCHAR(50),
     direccion TEXT,
-    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    nombre_norm VARCHAR(150) AS (LOWER(TRIM(nombre))) STORED,
+    INDEX idx_clientes_nombre_norm (nombre_norm)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS proveedores (
@@ -137,7 +168,9 @@ CREATE TABLE IF NOT EXISTS proveedores (
     direccion TEXT,
     contacto_nombre VARCHAR(150),
     contacto_telefono VARCHAR(50),
-    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    nombre_norm VARCHAR(150) AS (LOWER(TRIM(nombre))) STORED,
+    INDEX idx_proveedores_nombre_norm (nombre_norm)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 CREATE TABLE IF NOT EXISTS productos (
@@ -146,7 +179,9 @@ CREATE TABLE IF NOT EXISTS productos (
     sku VARCHAR(50) UNIQUE,
     precio_unitario DECIMAL(10,2) NOT NULL,
     descripcion TEXT,
-    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    nombre_norm VARCHAR(150) AS (LOWER(TRIM(nombre))) STORED,
+    INDEX idx_productos_nombre_norm (nombre_norm)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
 -- 6. Detalle de cada factura de venta o compra
@@ -159,6 +194,7 @@ CREATE TABLE IF NOT EXISTS factura_items (
     cantidad INT NOT NULL,
     precio DECIMAL(10,2) NOT NULL,
     subtotal DECIMAL(12,2) AS (cantidad * precio) STORED,
+    INDEX idx_items_tipo_id (factura_tipo, id),
     CONSTRAINT fk_item_venta FOREIGN KEY (factura_venta_id) REFERENCES facturas_venta(id) ON DELETE CASCADE,
     CONSTRAINT fk_item_compra FOREIGN KEY (factura_compra_id) REFERENCES facturas_compra(id) ON DELETE CASCADE,
     CONSTRAINT fk_item_producto FOREIGN KEY (producto_id) REFERENCES productos(id)
@@ -171,10 +207,48 @@ CREATE TABLE IF NOT EXISTS etl_hashes (
     INDEX idx_hash (record_hash)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- 8. High-water mark del ETL incremental
+CREATE TABLE IF NOT EXISTS etl_watermark (
+    nombre VARCHAR(50) PRIMARY KEY,
+    ultimo_raw_id INT NOT NULL DEFAULT 0,
+    ultimo_cambio DATETIME NULL,
+    actualizado_en DATETIME
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- 9. Checkpoints de corridas del ETL por chunks (reanudables)
+CREATE TABLE IF NOT EXISTS etl_checkpoint (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    modo VARCHAR(20) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'en_curso',
+    propietario VARCHAR(100) NULL,
+    ultimo_raw_id INT NOT NULL DEFAULT 0,
+    ultimo_cambio DATETIME NULL,
+    filas INT NOT NULL DEFAULT 0,
+    iniciado_en DATETIME,
+    actualizado_en DATETIME,
+    INDEX idx_checkpoint_modo_estado (modo, estado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
+-- 10. Filas de raw_data que fallaron en limpieza o carga (dead letter)
+CREATE TABLE IF NOT EXISTS etl_dead_letter (
+    raw_id INT PRIMARY KEY,
+    etapa VARCHAR(50) NOT NULL,
+    error TEXT,
+    intentos INT NOT NULL DEFAULT 1,
+    estado VARCHAR(20) NOT NULL DEFAULT 'aparcada',
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_dead_letter_estado (estado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
 
-
-
-
-
+-- 11. Idempotency-Key de los POST de ingesta (respuesta original para los reintentos)
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    clave VARCHAR(255) PRIMARY KEY,
+    endpoint VARCHAR(100) NOT NULL,
+    huella CHAR(64) NOT NULL,
+    respuesta_json TEXT NOT NULL,
+    status_code INT NOT NULL,
+    creado_en DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expira_en DATETIME NOT NULL,
+    INDEX idx_idempotency_expira (expira_en)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -17,7 +17,7 @@ def determinar_tabla_destino(tipo: str) -> str | None:
         return "ordenes_compra"
     return None
 
-def crear_entrada(db: Session, entrada_data: dict):
+def crear_entrada(db: Session, entrada_data: dict, confirmar: bool = True):
     entrada_data = entrada_data.copy()
     entrada_data["tipo"] = entrada_data.get("tipo", "").lower()
     entrada_data["descripcion"] = entrada_data.get("descripcion", "").strip()
@@ -25,6 +25,10 @@ def crear_entrada(db: Session, entrada_data: dict):
     nueva = RawData(**entrada_data)
     try:
         db.add(nueva)
+        if not confirmar:
+            # El commit lo hace quien llama (p. ej. junto con la Idempotency-Key)
+            db.flush()
+            return nueva
         db.commit()
         db.refresh(nueva)
         return nueva
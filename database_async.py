@@ -0,0 +1,34 @@
+import os
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database import MYSQL_DB, MYSQL_HOST, MYSQL_PASS, MYSQL_PORT, MYSQL_USER
+
+# Misma base que database.py, con driver asíncrono (aiomysql). Se puede
+# reemplazar, p. ej. por "sqlite+aiosqlite:///prueba.db" en pruebas locales.
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or (
+    f"mysql+aiomysql://{MYSQL_USER}:{MYSQL_PASS}@{MYSQL_HOST}:{MYSQL_PORT}/{MYSQL_DB}"
+    "?charset=utf8mb4"
+)
+# Conexiones del pool asíncrono: las peticiones que esperan una no ocupan un hilo
+ASYNC_POOL_SIZE = int(os.getenv("ASYNC_POOL_SIZE", "20"))
+ASYNC_MAX_OVERFLOW = int(os.getenv("ASYNC_MAX_OVERFLOW", "20"))
+
+_pool = {} if ASYNC_DATABASE_URL.startswith("sqlite") else {
+    "pool_size": ASYNC_POOL_SIZE,
+    "max_overflow": ASYNC_MAX_OVERFLOW,
+}
+
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,   # evita conexiones muertas
+    pool_recycle=3600,    # recicla conexiones cada hora
+    **_pool,
+)
+
+# expire_on_commit=False: tras el commit los objetos se siguen leyendo sin volver a la base
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
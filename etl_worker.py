@@ -0,0 +1,171 @@
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from sqlalchemy import text
+
+import etl_pipeline
+import respaldos
+
+# Latencia objetivo de punta a punta (fila confirmada en raw_data -> cargada)
+ETL_WORKER_LATENCIA_MS = int(os.getenv("ETL_WORKER_LATENCIA_MS", "1000"))
+# Cada cuánto se consulta la marca de cambios de raw_data (ver _marca)
+ETL_WORKER_POLL_MS = int(os.getenv("ETL_WORKER_POLL_MS", "100"))
+# Espera tras un error antes de reintentar
+ETL_WORKER_PAUSA_ERROR_S = int(os.getenv("ETL_WORKER_PAUSA_ERROR_S", "10"))
+# Cada cuánto se cierra el delta de respaldo que comparten los micro-lotes (como el scheduler)
+ETL_WORKER_RESPALDO_S = int(os.getenv("ETL_WORKER_RESPALDO_S", "600"))
+
+# Logging
+logging.basicConfig(
+    filename="etl_worker.log",
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s",
+    datefmt="%Y-%m-%d %H:%M:%S",
+)
+console = logging.StreamHandler()
+console.setLevel(logging.INFO)
+formatter = logging.Formatter("%(asctime)s [%(levelname)s] %(message)s", "%H:%M:%S")
+console.setFormatter(formatter)
+logging.getLogger().addHandler(console)
+
+_detener = threading.Event()
+
+
+def _marca(conn):
+    """(MAX(id), MAX(actualizado_en), primera fila pendiente) de raw_data, todo por índice.
+
+    La primera pendiente detecta una fila que confirmó tarde con un id menor
+    que MAX(id) y sin mover MAX(actualizado_en).
+    """
+    return tuple(conn.execute(text("""
+        SELECT MAX(id), MAX(actualizado_en),
+               (SELECT MIN(id) FROM raw_data WHERE etl_estado = 'pendiente')
+        FROM raw_data
+    """)).one())
+
+
+def _rotar(ventana, forzar=False):
+    """Cierra el delta de la ventana si venció y lo deja en el log."""
+    raw_file, _ = ventana.rotar(forzar)
+    if raw_file:
+        logging.info(f"Delta de respaldo cerrado: {raw_file}")
+
+
+def ejecutar(latencia_ms=None, poll_ms=None, detener=None):
+    """Bucle del worker: detecta filas nuevas o editadas y las procesa en micro-lotes.
+
+    Al ver un cambio en la marca espera una ventana de agrupación (lo que
+    sobra de la latencia objetivo tras la duración media de las últimas
+    corridas y un intervalo de poll) y luego corre el ETL incremental sobre
+    todo lo acumulado. Bajo ráfagas, lo que llega mientras corre un lote
+    entra completo en el siguiente, así que el costo fijo de cada corrida
+    se reparte entre más filas. Los micro-lotes de una ventana de
+    ETL_WORKER_RESPALDO_S escriben en un mismo delta de respaldo.
+    """
+    latencia = (latencia_ms or ETL_WORKER_LATENCIA_MS) / 1000
+    poll = (poll_ms or ETL_WORKER_POLL_MS) / 1000
+    detener = detener or _detener
+    ventana = respaldos.VentanaRespaldo(ETL_WORKER_RESPALDO_S)
+    ultima = None
+    duracion_media = 0.0
+
+    logging.info(f"Worker ETL iniciado (latencia objetivo {latencia * 1000:.0f} ms, poll {poll * 1000:.0f} ms)")
+    while not detener.is_set():
+        try:
+            _rotar(ventana)
+            with etl_pipeline.engine.connect() as conn:
+                marca = _marca(conn)
+            if marca == ultima:
+                detener.wait(poll)
+                continue
+
+            detectado = time.perf_counter()
+            espera = latencia - duracion_media - poll
+            if ultima is not None and espera > 0:
+                detener.wait(espera)
+
+            inicio = time.perf_counter()
+            resumen = etl_pipeline.run_etl(
+                incremental=True,
+                respaldo_completo=False,  # los snapshots completos quedan para las corridas programadas
+                precargar_cache=False,
+                escribir_log=False,
+                respaldo=ventana.actual(),
+            )
+            fin = time.perf_counter()
+            duracion_media = (fin - inicio) if ultima is None else 0.8 * duracion_media + 0.2 * (fin - inicio)
+            ultima = marca
+            if resumen["total_raw"]:
+                logging.info(
+                    f"Micro-lote: {resumen['total_raw']} filas leídas, {resumen['total_cleaned']} cargadas, "
+                    f"{resumen['aparcados']} aparcadas en {(fin - detectado) * 1000:.0f} ms "
+                    f"(proceso {(fin - inicio) * 1000:.0f} ms)"
+                )
+        except Exception:
+            logging.exception("Error en el worker ETL")
+            detener.wait(ETL_WORKER_PAUSA_ERROR_S)
+    _rotar(ventana, forzar=True)
+    logging.info("Worker ETL detenido.")
+
+
+def ejecutar_cola(lote=None, poll_ms=None, detener=None):
+    """Bucle del worker en modo cola: reclama lotes de raw_data con lease y los procesa.
+
+    Pensado para correr varias instancias (procesos o hosts) a la vez: cada
+    una reclama filas disjuntas (SELECT ... FOR UPDATE SKIP LOCKED), así el
+    throughput crece agregando workers. Mientras haya filas pendientes
+    encadena lotes sin esperar; con la cola vacía consulta cada `poll_ms`.
+    Como en ejecutar(), los lotes de una ventana comparten un delta de respaldo.
+    """
+    poll = (poll_ms or ETL_WORKER_POLL_MS) / 1000
+    detener = detener or _detener
+    ventana = respaldos.VentanaRespaldo(ETL_WORKER_RESPALDO_S)
+    propietario = f"{socket.gethostname()}:{os.getpid()}"
+
+    logging.info(f"Worker ETL de cola iniciado como {propietario} (lote {lote or etl_pipeline.ETL_COLA_LOTE})")
+    while not detener.is_set():
+        try:
+            _rotar(ventana)
+            inicio = time.perf_counter()
+            resumen = etl_pipeline.procesar_cola(propietario, lote=lote, respaldo=ventana.actual())
+            if not resumen["reclamadas"]:
+                detener.wait(poll)
+                continue
+            logging.info(
+                f"Lote: {resumen['reclamadas']} filas reclamadas, {resumen['total_cleaned']} cargadas, "
+                f"{resumen['aparcados']} aparcadas, {resumen['ocupadas']} ocupadas "
+                f"en {(time.perf_counter() - inicio) * 1000:.0f} ms"
+            )
+        except Exception:
+            logging.exception("Error en el worker ETL de cola")
+            detener.wait(ETL_WORKER_PAUSA_ERROR_S)
+    _rotar(ventana, forzar=True)
+    logging.info("Worker ETL de cola detenido.")
+
+
+def _al_terminar(signum, frame):
+    _detener.set()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Worker ETL continuo por micro-lotes")
+    parser.add_argument("--latencia-ms", type=int, default=None,
+                        help=f"latencia objetivo de punta a punta (por defecto {ETL_WORKER_LATENCIA_MS})")
+    parser.add_argument("--poll-ms", type=int, default=None,
+                        help=f"intervalo de consulta de raw_data (por defecto {ETL_WORKER_POLL_MS})")
+    parser.add_argument("--cola", action="store_true",
+                        help="reclamar lotes de la cola de raw_data (varios workers en paralelo)")
+    parser.add_argument("--lote", type=int, default=None,
+                        help="filas por lote reclamado en modo cola (por defecto ETL_COLA_LOTE)")
+    args = parser.parse_args()
+    signal.signal(signal.SIGTERM, _al_terminar)
+    signal.signal(signal.SIGINT, _al_terminar)
+    if args.cola:
+        ejecutar_cola(lote=args.lote, poll_ms=args.poll_ms)
+    else:
+        ejecutar(latencia_ms=args.latencia_ms, poll_ms=args.poll_ms)
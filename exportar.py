@@ -0,0 +1,77 @@
+import csv
+import io
+import os
+from datetime import timedelta
+
+import orjson
+from sqlalchemy import select
+
+import models
+import serializadores
+from database import engine
+
+# Filas por lectura del cursor del lado del servidor (y por bloque enviado al cliente)
+EXPORT_CHUNK = int(os.getenv("EXPORT_CHUNK", "5000"))
+
+# Nombre en la URL -> modelo
+TABLAS = {
+    "raw": models.RawData,
+    "cleaned": models.CleanedData,
+    "facturas_venta": models.FacturaVenta,
+    "facturas_compra": models.FacturaCompra,
+    "pagos_recibidos": models.PagoRecibido,
+    "pagos_proveedor": models.PagoProveedor,
+    "factura_items": models.FacturaItem,
+}
+
+TIPOS_MEDIA = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+
+def _consulta(modelo, desde=None, hasta=None):
+    tabla = modelo.__table__
+    sql = select(tabla).order_by(tabla.c.id)
+    if "fecha" in tabla.c:
+        # hasta inclusivo, igual que en los listados
+        if desde is not None:
+            sql = sql.where(tabla.c.fecha >= desde)
+        if hasta is not None:
+            sql = sql.where(tabla.c.fecha < hasta + timedelta(days=1))
+    return sql
+
+
+def _bloque_ndjson(serializador, rows):
+    # Mismo formato que los listados de la API
+    return b"".join(orjson.dumps(serializador.fila(row)) + b"\n" for row in rows)
+
+
+def exportar(nombre, formato="ndjson", desde=None, hasta=None, chunk_size=None):
+    """Genera el contenido de la exportación de `nombre` en bloques (bytes en NDJSON, texto en CSV).
+
+    Lee con un cursor del lado del servidor (SSCursor de PyMySQL) y emite un
+    bloque por chunk, así la memoria no depende del tamaño de la tabla y el
+    primer bloque sale apenas llega el primer chunk. Usa su propia conexión
+    (no la sesión del request): el cuerpo se sigue enviando después de que
+    el endpoint retornó.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK
+    modelo = TABLAS[nombre]
+    sql = _consulta(modelo, desde, hasta)
+    with engine.connect() as lectura:
+        result = lectura.execution_options(
+            stream_results=True, max_row_buffer=chunk_size
+        ).execute(sql)
+        columns = list(result.keys())
+        if formato == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield buffer.getvalue()
+            for rows in result.partitions(chunk_size):
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(rows)
+                yield buffer.getvalue()
+        else:
+            serializador = serializadores.de(modelo)
+            for rows in result.partitions(chunk_size):
+                yield _bloque_ndjson(serializador, rows)
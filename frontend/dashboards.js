@@ -9,29 +9,10 @@
   };
 
   // ---------- Helpers ----------
-  function parseISODate(s) {
-    // espera "YYYY-MM-DD"
-    if (!s || typeof s !== "string") return null;
-    const [y, m, d] = s.split("-").map(Number);
-    if (!y || !m || !d) return null;
-    return new Date(y, m - 1, d);
-  }
-
-  function lastNMonths(n = 12) {
-    const base = new Date();
-    base.setDate(1); // 1ro del mes actual
-    const labels = [];
-    const keys = [];
-    for (let i = n - 1; i >= 0; i--) {
-      const d = new Date(base.getFullYear(), base.getMonth() - i, 1);
-      labels.push(d.toLocaleString("es-CR", { month: "short" })); // ene, feb...
-      keys.push(`${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, "0")}`);
-    }
-    return { labels, keys };
-  }
-
-  function monthKey(d) {
-    return `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, "0")}`;
+  function monthLabel(mes) {
+    // "YYYY-MM" -> ene, feb...
+    const [y, m] = mes.split("-").map(Number);
+    return new Date(y, m - 1, 1).toLocaleString("es-CR", { month: "short" });
   }
 
   function formatCRC(n) {
@@ -46,57 +27,35 @@
     }
   }
 
+  function seriesByMonth(resumen) {
+    return {
+      labels: resumen.meses.map((m) => monthLabel(m.mes)),
+      values: resumen.meses.map((m) => m.total),
+    };
+  }
+
   function setText(id, val) {
     const el = document.getElementById(id);
     if (el) el.textContent = val;
   }
 
-  function sumBetween(rows, fromDate) {
-    let s = 0;
-    for (const r of rows) {
-      const d = parseISODate(r.fecha);
-      if (!d) continue;
-      if (d >= fromDate) s += Number(r.monto || 0);
-    }
-    return s;
-  }
-
-  function avgAmount(rows) {
-    if (!rows.length) return 0;
-    const total = rows.reduce((acc, r) => acc + Number(r.monto || 0), 0);
-    return rows.length ? total / rows.length : 0;
-  }
-
-  function seriesByMonth(rows) {
-    const { labels, keys } = lastNMonths(12);
-    const map = new Map(keys.map((k) => [k, 0]));
-    for (const r of rows) {
-      const d = parseISODate(r.fecha);
-      if (!d) continue;
-      const mk = monthKey(d);
-      if (map.has(mk)) {
-        map.set(mk, map.get(mk) + Number(r.monto || 0));
-      }
-    }
-    return { labels, values: keys.map((k) => map.get(k) || 0) };
+  // ---------- Fetch ----------
+  // KPIs y serie de 12 meses ya agregados en el servidor (no se baja la tabla de facturas)
+  async function fetchResumen(tipo, error) {
+    const res = await fetch(`${API}/api/reportes/mensual/?tipo=${tipo}&meses=12`);
+    if (!res.ok) throw new Error(error);
+    return res.json();
   }
 
-  // ---------- Fetch ----------
   async function getVentas() {
     if (state.ventas) return state.ventas;
-    const res = await fetch(`${API}/api/facturas/venta/`);
-    if (!res.ok) throw new Error("No se pudo obtener ventas");
-    const data = await res.json();
-    state.ventas = Array.isArray(data) ? data : [];
+    state.ventas = await fetchResumen("venta", "No se pudo obtener ventas");
     return state.ventas;
   }
 
   async function getCompras() {
     if (state.compras) return state.compras;
-    const res = await fetch(`${API}/api/facturas/compra/`);
-    if (!res.ok) throw new Error("No se pudo obtener compras");
-    const data = await res.json();
-    state.compras = Array.isArray(data) ? data : [];
+    state.compras = await fetchResumen("compra", "No se pudo obtener compras");
     return state.compras;
   }
 
@@ -105,12 +64,9 @@
     const ventas = await getVentas();
 
     // KPIs
-    const now = new Date();
-    const startMonth = new Date(now.getFullYear(), now.getMonth(), 1);
-    const start30 = new Date(now.getFullYear(), now.getMonth(), now.getDate() - 30);
-    setText("kpi_ingresos_mes", formatCRC(sumBetween(ventas, startMonth)));
-    setText("kpi_ingresos_30d", formatCRC(sumBetween(ventas, start30)));
-    setText("kpi_ticket_prom", formatCRC(avgAmount(ventas)));
+    setText("kpi_ingresos_mes", formatCRC(ventas.total_mes));
+    setText("kpi_ingresos_30d", formatCRC(ventas.total_30d));
+    setText("kpi_ticket_prom", formatCRC(ventas.promedio));
 
     // Serie mensual
     const serie = seriesByMonth(ventas);
@@ -146,11 +102,8 @@
   async function renderGastos() {
     const compras = await getCompras();
 
-    const now = new Date();
-    const startMonth = new Date(now.getFullYear(), now.getMonth(), 1);
-    const start30 = new Date(now.getFullYear(), now.getMonth(), now.getDate() - 30);
-    setText("kpi_gastos_mes", formatCRC(sumBetween(compras, startMonth)));
-    setText("kpi_gastos_30d", formatCRC(sumBetween(compras, start30)));
+    setText("kpi_gastos_mes", formatCRC(compras.total_mes));
+    setText("kpi_gastos_30d", formatCRC(compras.total_30d));
     setText("kpi_categoria_top", "—"); // Si luego tienes categorías, lo calculamos
 
     const serie = seriesByMonth(compras);
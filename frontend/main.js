@@ -33,13 +33,18 @@ function mostrarMensaje(form, texto, tipo = "success") {
   cont.innerHTML = `<div class="mensaje ${tipo}">${texto}</div>`;
 }
 
-// Hacer fetch y poblar una tabla
-async function cargarTabla(path, tbodyId, cols) {
-  const res = await fetch(`${API_BASE}${path}`);
+// Hacer fetch y poblar una tabla (paginada: "Cargar más" pide la siguiente página)
+async function cargarTabla(path, tbodyId, cols, after = null) {
+  const sep = path.includes("?") ? "&" : "?";
+  const res = await fetch(`${API_BASE}${path}` + (after ? `${sep}after=${after}` : ""));
   const data = await res.json();
   const tbody = document.getElementById(tbodyId);
   if (!tbody) return;
-  tbody.innerHTML = "";
+  if (after) {
+    tbody.querySelector("tr.cargar-mas")?.remove();
+  } else {
+    tbody.innerHTML = "";
+  }
   data.forEach(item => {
     const tr = document.createElement("tr");
     cols.forEach(c => {
@@ -54,6 +59,56 @@ async function cargarTabla(path, tbodyId, cols) {
       </td>`;
     tbody.append(tr);
   });
+  const siguiente = res.headers.get("X-Next-Cursor");
+  if (siguiente) {
+    const tr = document.createElement("tr");
+    tr.className = "cargar-mas";
+    tr.innerHTML = `<td colspan="${cols.length + 1}"><button type="button">Cargar más</button></td>`;
+    tr.querySelector("button").addEventListener("click", () => cargarTabla(path, tbodyId, cols, siguiente));
+    tbody.append(tr);
+  }
+}
+
+// Todas las filas de un listado paginado para un dropdown: sigue X-Next-Cursor
+// página a página (máximo 1000 filas por página, ver paginar en main.py)
+async function fetchTodasLasPaginas(path) {
+  const filas = [];
+  const sep = path.includes("?") ? "&" : "?";
+  let after = null;
+  do {
+    const res = await fetch(`${API_BASE}${path}${sep}limit=1000` + (after ? `&after=${after}` : ""));
+    if (!res.ok) throw new Error(await res.text());
+    filas.push(...await res.json());
+    after = res.headers.get("X-Next-Cursor");
+  } while (after);
+  return filas;
+}
+
+// Lanzar el ETL (trabajo asíncrono) y esperar a que termine consultando su estado
+async function ejecutarPipeline(onProgreso) {
+  const res = await fetch(`${API_BASE}/api/pipeline/run`, { method: "POST" });
+  if (!res.ok) throw new Error(await res.text());
+  const { job_id } = await res.json();
+  while (true) {
+    await new Promise(r => setTimeout(r, 1000));
+    const resJob = await fetch(`${API_BASE}/api/pipeline/jobs/${job_id}`);
+    if (!resJob.ok) throw new Error(await resJob.text());
+    const job = await resJob.json();
+    if (job.estado === "completado") return job;
+    if (job.estado === "error") throw new Error(job.error);
+    if (onProgreso) onProgreso(job);
+  }
+}
+
+// Procesar solo las filas recién creadas (sin recorrer raw_data completa)
+async function procesarRegistros(rawIds) {
+  const res = await fetch(`${API_BASE}/api/pipeline/run/registros`, {
+    method: "POST",
+    headers: {"Content-Type":"application/json"},
+    body: JSON.stringify({ raw_ids: rawIds })
+  });
+  if (!res.ok) throw new Error(await res.text());
+  return res.json();
 }
 
 // Carga inicial de todas las tablas
@@ -203,8 +258,7 @@ async function handleTableClick(e) {
 // Cargar clientes en dropdown
 async function cargarClientesDropdown() {
   try {
-    const response = await fetch(`${API_BASE}/api/clientes/`);
-    const clientes = await response.json();
+    const clientes = await fetchTodasLasPaginas("/api/clientes/?fields=nombre,identificacion");
     const select = document.getElementById("select-cliente-venta");
 
     // Limpiar opciones existentes (excepto las primeras dos)
@@ -228,8 +282,7 @@ async function cargarClientesDropdown() {
 // Cargar proveedores en dropdowns
 async function cargarProveedoresDropdowns() {
   try {
-    const response = await fetch(`${API_BASE}/api/proveedores/`);
-    const proveedores = await response.json();
+    const proveedores = await fetchTodasLasPaginas("/api/proveedores/?fields=nombre,identificacion");
 
     // Cargar en dropdown de compra y orden
     const selectCompra = document.getElementById("select-proveedor-compra");
@@ -258,8 +311,7 @@ async function cargarProveedoresDropdowns() {
 // Cargar productos en dropdowns
 async function cargarProductosDropdowns() {
   try {
-    const response = await fetch(`${API_BASE}/api/productos/`);
-    const productos = await response.json();
+    const productos = await fetchTodasLasPaginas("/api/productos/?fields=nombre,precio_unitario");
 
     // Cargar en dropdown de venta
     const selectVenta = document.getElementById("select-producto-venta");
@@ -472,8 +524,8 @@ catch { document.querySelectorAll('.contenido-seccion').forEach(s => s.style.dis
         if (!res.ok) throw new Error(result.detail || res.statusText);
         mostrarMensaje(formVenta, `✅ ${result.message}. Raw ID: ${result.raw_id}.`, "success");
 
-        // opcional: ejecutar ETL
-        try { await fetch(`${API_BASE}/api/pipeline/run`, { method: "POST" }); } catch {}
+        // materializar solo la factura recién creada
+        try { await procesarRegistros([result.raw_id]); } catch {}
 
         // refrescar dashboards
         try { if (typeof window.refreshDashboards === 'function') window.refreshDashboards(); } catch {}
@@ -544,7 +596,7 @@ catch { document.querySelectorAll('.contenido-seccion').forEach(s => s.style.dis
         if (!res.ok) throw new Error(result.detail || res.statusText);
         mostrarMensaje(formCompra, `✅ ${result.message}. Raw ID: ${result.raw_id}.`, "success");
 
-        try { await fetch(`${API_BASE}/api/pipeline/run`, { method: "POST" }); } catch {}
+        try { await procesarRegistros([result.raw_id]); } catch {}
 
         // refrescar dashboards
         try { if (typeof window.refreshDashboards === 'function') window.refreshDashboards(); } catch {}
@@ -656,8 +708,7 @@ catch { document.querySelectorAll('.contenido-seccion').forEach(s => s.style.dis
     const cargarFacturasDropdowns = async () => {
       try {
         // Cargar facturas de venta
-        const resVenta = await fetch(`${API_BASE}/api/facturas/venta/`);
-        const facturasVenta = await resVenta.json();
+        const facturasVenta = await fetchTodasLasPaginas("/api/facturas/venta/?fields=cliente,monto");
         const selectVenta = document.getElementById("select-factura-venta-item");
         selectVenta.innerHTML = '<option value="">-- Seleccione factura de venta --</option>';
         facturasVenta.forEach(f => {
@@ -668,8 +719,7 @@ catch { document.querySelectorAll('.contenido-seccion').forEach(s => s.style.dis
         });
 
         // Cargar facturas de compra
-        const resCompra = await fetch(`${API_BASE}/api/facturas/compra/`);
-        const facturasCompra = await resCompra.json();
+        const facturasCompra = await fetchTodasLasPaginas("/api/facturas/compra/?fields=proveedor,monto");
         const selectCompra = document.getElementById("select-factura-compra-item");
         selectCompra.innerHTML = '<option value="">-- Seleccione factura de compra --</option>';
         facturasCompra.forEach(f => {
@@ -680,8 +730,7 @@ catch { document.querySelectorAll('.contenido-seccion').forEach(s => s.style.dis
         });
 
         // Cargar productos
-        const resProductos = await fetch(`${API_BASE}/api/productos/`);
-        const productos = await resProductos.json();
+        const productos = await fetchTodasLasPaginas("/api/productos/?fields=nombre,precio_unitario");
         const selectProducto = document.getElementById("select-producto-item");
         selectProducto.innerHTML = '<option value="">-- Seleccione producto --</option>';
         productos.forEach(p => {
@@ -761,9 +810,11 @@ catch { document.querySelectorAll('.contenido-seccion').forEach(s => s.style.dis
     const sec = document.getElementById("admin-etl");
     mostrarMensaje(sec, "Ejecutando pipeline...", "loading");
     try {
-      const res = await fetch(`${API_BASE}/api/pipeline/run`, { method: "POST" });
-      if (!res.ok) throw new Error(await res.text());
-      mostrarMensaje(sec, "✅ Pipeline OK", "success");
+      const job = await ejecutarPipeline(j => {
+        const filas = j.progreso ? j.progreso.filas_leidas : 0;
+        mostrarMensaje(sec, `Ejecutando pipeline... ${filas} filas leídas`, "loading");
+      });
+      mostrarMensaje(sec, `✅ Pipeline OK (${job.resultado.total_cleaned} registros procesados)`, "success");
       cargarTabla("/api/cleaned/", "tabla-etl", ["id","tipo","descripcion","monto","fecha","validado_por","tabla_destino"]);
     } catch (e) {
       mostrarMensaje(sec, `❌ ${e.message}`, "error");
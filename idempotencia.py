@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+
+import models
+
+# Cuánto se recuerda una Idempotency-Key (los reintentos de un cliente llegan en minutos)
+IDEMPOTENCY_TTL_HORAS = int(os.getenv("IDEMPOTENCY_TTL_HORAS", "24"))
+MAX_LARGO_CLAVE = 255
+
+
+def _huella(endpoint, payload):
+    """sha256 del endpoint y el cuerpo: la misma clave con otra petición es un error del cliente."""
+    cuerpo = payload.model_dump(mode="json") if hasattr(payload, "model_dump") else payload
+    contenido = json.dumps([endpoint, cuerpo], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()
+
+
+def _repetida(fila):
+    return JSONResponse(
+        content=json.loads(fila.respuesta_json),
+        status_code=fila.status_code,
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def buscar(db, clave, endpoint, payload):
+    """Respuesta original si `clave` ya se usó (y no venció); None si la petición es nueva.
+
+    Sin clave no hay nada que buscar. Una clave vencida se borra en la
+    misma transacción para que la petición la vuelva a registrar.
+    """
+    if clave is None:
+        return None
+    if not clave or len(clave) > MAX_LARGO_CLAVE:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key debe tener entre 1 y {MAX_LARGO_CLAVE} caracteres")
+    fila = db.get(models.IdempotencyKey, clave)
+    if fila is None:
+        return None
+    if fila.expira_en <= datetime.utcnow():
+        db.delete(fila)
+        db.flush()
+        return None
+    if fila.huella != _huella(endpoint, payload):
+        raise HTTPException(status_code=422, detail="Idempotency-Key ya usada con otra petición")
+    return _repetida(fila)
+
+
+def confirmar(db, clave, endpoint, payload, respuesta, status_code=201):
+    """Guarda la respuesta junto con la fila de raw_data (misma transacción) y hace commit.
+
+    Si otra petición con la misma clave confirmó primero, el INSERT de la
+    clave falla por la PK: se descarta todo lo de esta (incluida su fila en
+    raw_data) y se devuelve la respuesta de aquella.
+    """
+    if clave is None:
+        db.commit()
+        return respuesta
+    ahora = datetime.utcnow()
+    db.add(models.IdempotencyKey(
+        clave=clave,
+        endpoint=endpoint,
+        huella=_huella(endpoint, payload),
+        respuesta_json=json.dumps(respuesta, default=str),
+        status_code=status_code,
+        creado_en=ahora,
+        expira_en=ahora + timedelta(hours=IDEMPOTENCY_TTL_HORAS),
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        previa = buscar(db, clave, endpoint, payload)
+        if previa is None:
+            raise
+        return previa
+    return respuesta
+
+
+def purgar_vencidas(db):
+    """Borra las claves vencidas (por el índice de expira_en); devuelve cuántas."""
+    borradas = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.expira_en <= datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return borradas
@@ -0,0 +1,140 @@
+import csv
+import io
+import json
+import os
+import uuid
+from datetime import datetime
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from crud import determinar_tabla_destino
+
+# Filas por INSERT multi-fila (y por transacción) en la carga masiva
+INGESTA_LOTE = int(os.getenv("INGESTA_LOTE", "5000"))
+# Tope de filas por petición
+INGESTA_MAX_FILAS = int(os.getenv("INGESTA_MAX_FILAS", "200000"))
+
+# Solo placeholders en VALUES: PyMySQL lo reescribe a un único INSERT multi-fila
+INSERT_RAW = text("""
+    INSERT INTO raw_data (tipo, descripcion, monto, fecha, creado_en, tabla_destino, actualizado_en, lote_ingesta)
+    VALUES (:tipo, :descripcion, :monto, :fecha, :creado_en, :tabla_destino, :actualizado_en, :lote_ingesta)
+""")
+
+
+def leer_filas(cuerpo, content_type):
+    """Separa el cuerpo en filas (dicts) según el Content-Type.
+
+    JSON: un arreglo de objetos. NDJSON: un objeto por línea. CSV: con
+    encabezado (tipo,descripcion,monto,fecha). Una línea NDJSON ilegible
+    queda como la excepción en su posición, para reportarla sin cortar el resto.
+    """
+    tipo = (content_type or "application/json").split(";")[0].strip().lower()
+    try:
+        texto = cuerpo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="El cuerpo debe estar en UTF-8")
+    if tipo in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        filas = []
+        for linea in texto.splitlines():
+            if not linea.strip():
+                continue
+            try:
+                filas.append(json.loads(linea))
+            except ValueError as e:
+                filas.append(e)
+    elif tipo in ("text/csv", "application/csv"):
+        filas = list(csv.DictReader(io.StringIO(texto)))
+    elif tipo == "application/json":
+        try:
+            filas = json.loads(texto)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"JSON inválido: {e}")
+        if not isinstance(filas, list):
+            raise HTTPException(status_code=400, detail="Se esperaba un arreglo JSON de filas")
+    else:
+        raise HTTPException(
+            status_code=415,
+            detail="Content-Type no soportado: usar application/json, application/x-ndjson o text/csv",
+        )
+    if len(filas) > INGESTA_MAX_FILAS:
+        raise HTTPException(status_code=413, detail=f"Máximo {INGESTA_MAX_FILAS} filas por petición")
+    return filas
+
+
+def _error_validacion(e):
+    return "; ".join(f"{'.'.join(map(str, err['loc'])) or 'fila'}: {err['msg']}" for err in e.errors())
+
+
+def validar(filas, esquema):
+    """Devuelve (válidas, resultados): válidas son (posición, fila para INSERT_RAW).
+
+    resultados ya trae los errores de validación; las posiciones válidas
+    quedan en None hasta que insertar() les asigna su raw_id.
+    """
+    validas = []
+    resultados = [None] * len(filas)
+    for i, fila in enumerate(filas):
+        if isinstance(fila, Exception):
+            resultados[i] = {"fila": i, "error": f"JSON inválido: {fila}"}
+            continue
+        try:
+            entrada = esquema.model_validate(fila)
+        except ValidationError as e:
+            resultados[i] = {"fila": i, "error": _error_validacion(e)}
+            continue
+        # Misma normalización que crud.crear_entrada
+        tipo = entrada.tipo.lower()
+        validas.append((i, {
+            "tipo": tipo,
+            "descripcion": entrada.descripcion.strip(),
+            "monto": entrada.monto,
+            "fecha": entrada.fecha,
+            "tabla_destino": determinar_tabla_destino(tipo),
+        }))
+    return validas, resultados
+
+
+def insertar(db, validas, resultados, lote=None):
+    """Inserta las filas `validas` en raw_data por lotes multi-fila.
+
+    Cada lote va en su propia transacción y se marca con un lote_ingesta
+    único: los ids se recuperan luego por ese índice en orden de id, que es
+    el orden de las filas en el INSERT (con innodb_autoinc_lock_mode=2 no
+    son necesariamente consecutivos). Si un lote falla en la base, sus filas
+    quedan como error y se sigue con el siguiente.
+
+    Devuelve un resultado por fila, en el orden recibido: raw_id o error.
+    """
+    lote = lote or INGESTA_LOTE
+    for inicio in range(0, len(validas), lote):
+        bloque = validas[inicio:inicio + lote]
+        marca = uuid.uuid4().hex
+        ahora = datetime.utcnow()
+        params = [
+            {**fila, "creado_en": ahora, "actualizado_en": ahora, "lote_ingesta": marca}
+            for _, fila in bloque
+        ]
+        try:
+            db.execute(INSERT_RAW, params)
+            ids = db.execute(
+                text("SELECT id FROM raw_data WHERE lote_ingesta = :marca ORDER BY id"), {"marca": marca}
+            ).scalars().all()
+            db.commit()
+        except SQLAlchemyError as e:
+            db.rollback()
+            for i, _ in bloque:
+                resultados[i] = {"fila": i, "error": f"Error guardando raw: {e.__class__.__name__}"}
+            continue
+        for (i, _), raw_id in zip(bloque, ids):
+            resultados[i] = {"fila": i, "raw_id": raw_id}
+    insertadas = sum(1 for r in resultados if "raw_id" in r)
+    return {"insertadas": insertadas, "errores": len(resultados) - insertadas, "resultados": resultados}
+
+
+def ingestar(db, filas, esquema, lote=None):
+    """Valida `filas` con `esquema` y las inserta en raw_data (validar + insertar)."""
+    validas, resultados = validar(filas, esquema)
+    return insertar(db, validas, resultados, lote)
@@ -1,15 +1,30 @@
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from pydantic import BaseModel, field_validator, model_validator
-from datetime import date, datetime
+from datetime import date, datetime, timedelta
 from decimal import Decimal
-from typing import Optional, Any, Literal, List
+from typing import Optional, Any, Literal
 import json
 
 import models
 from database import SessionLocal, engine
+from database_async import get_async_db
 from etl_pipeline import run_etl
+import exportar
+import idempotencia
+import ingesta
+import pipeline_jobs
+import reportes
+import serializadores
+from schemas import (
+    RawEntryIn, FacturaVentaIn, FacturaCompraIn, RecurringTemplateIn, PagoRecibidoIn,
+    PagoProveedorIn, ClienteIn, ProveedorIn, ProductoIn, FacturaItemIn,
+    FacturaVentaCreateIn, FacturaCompraCreateIn, PipelineRegistrosIn,
+)
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.exc import IntegrityError
 
 # Crear todas las tablas
@@ -22,6 +37,7 @@ app.add_middleware(
     allow_origins=["*"],  # en producción restringir
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Dependencia de DB
@@ -32,136 +48,49 @@ def get_db():
     finally:
         db.close()
 
-# Serialización genérica
+# Serialización genérica (conversores precompilados por modelo, ver serializadores.py)
 def serialize_row(obj: Any) -> dict:
-    d = {}
-    for col in obj.__table__.columns:
-        val = getattr(obj, col.name)
-        if isinstance(val, Decimal):
-            d[col.name] = float(val)
-        elif hasattr(val, "isoformat"):
-            d[col.name] = val.isoformat()
-        else:
-            d[col.name] = val
-    return d
-
-# ------------------------------
-# Schemas Pydantic
-# ------------------------------
-class RawEntryIn(BaseModel):
-    tipo: str
-    descripcion: str
-    monto: float
-    fecha: date
-
-    @field_validator("tipo")
-    def tipo_valido(cls, v):
-        if v.lower() not in (
-            "ingreso",
-            "gasto",
-            "factura_recurrente",
-            "pago_recibido",
-            "pago_proveedor",
-            "orden_compra",
-        ):
-            raise ValueError("tipo inválido")
-        return v.lower()
-
-class FacturaVentaIn(BaseModel):
-    cliente: str
-    descripcion: str
-    monto: float
-    fecha: date
-    raw_id: Optional[int] = None
-
-class FacturaCompraIn(BaseModel):
-    proveedor: str
-    descripcion: str
-    monto: float
-    fecha: date
-    raw_id: Optional[int] = None
-
-class RecurringTemplateIn(BaseModel):
-    cliente: str
-    descripcion: str
-    monto: float
-    frecuencia: str
-
-class PagoRecibidoIn(BaseModel):
-    factura_venta_id: int
-    monto: float
-    fecha: date
-
-    @model_validator(mode="after")
-    def verifica_factura(cls, v):
-        # Puede agregar validación adicional aquí
-        return v
-
-class PagoProveedorIn(BaseModel):
-    factura_compra_id: Optional[int] = None
-    orden_compra_id: Optional[int] = None
-    monto: float
-    fecha: date
-
-    @model_validator(mode="after")
-    def al_menos_uno(cls, v):
-        if not v.factura_compra_id and not v.orden_compra_id:
-            raise ValueError("Se requiere factura_compra_id o orden_compra_id")
-        return v
-
-class ClienteIn(BaseModel):
-    nombre: str
-    identificacion: Optional[str] = None
-    correo: Optional[str] = None
-    telefono: Optional[str] = None
-    direccion: Optional[str] = None
-
-class ProveedorIn(BaseModel):
-    nombre: str
-    identificacion: Optional[str] = None
-    correo: Optional[str] = None
-    telefono: Optional[str] = None
-    direccion: Optional[str] = None
-    contacto_nombre: Optional[str] = None
-    contacto_telefono: Optional[str] = None
-
-class ProductoIn(BaseModel):
-    nombre: str
-    sku: Optional[str] = None
-    precio_unitario: float
-    descripcion: Optional[str] = None
-
-class FacturaItemIn(BaseModel):
-    factura_tipo: Literal['venta', 'compra']
-    factura_venta_id: Optional[int] = None
-    factura_compra_id: Optional[int] = None
-    producto_id: int
-    cantidad: int
-    precio: float
-
-class FacturaLineaIn(BaseModel):
-    producto_id: int
-    cantidad: int
-    precio: float
-
-class FacturaVentaCreateIn(BaseModel):
-    cliente: str
-    descripcion: str
-    fecha: date
-    items: List[FacturaLineaIn]  # requerido para múltiples productos
-
-class FacturaCompraCreateIn(BaseModel):
-    proveedor: str
-    descripcion: str
-    fecha: date
-    items: List[FacturaLineaIn]
+    return serializadores.de(type(obj)).objeto(obj)
+
+# Paginación por keyset sobre id, en el mismo orden descendente de siempre:
+# cada página es un rango del índice (id < after), cueste lo mismo con 1k que con 1M filas
+LIMITE_PAGINA = 100
+LIMITE_MAX_PAGINA = 1000
+
+async def paginar(db: AsyncSession, query, columna_id, limit: int, after: Optional[int], serializar):
+    """Una página del select `query` (columnas de `serializar`) ya lista para enviar."""
+    if after is not None:
+        query = query.filter(columna_id < after)
+    filas = (await db.execute(query.order_by(columna_id.desc()).limit(limit + 1))).all()
+    headers = {}
+    if len(filas) > limit:
+        # Hay más: el cliente pide la siguiente página con ?after=<X-Next-Cursor>
+        filas = filas[:limit]
+        headers["X-Next-Cursor"] = str(getattr(filas[-1], columna_id.key))
+    return serializadores.RespuestaJSON([serializar(f) for f in filas], headers=headers)
+
+def filtrar_fechas(query, columna, desde: Optional[date], hasta: Optional[date]):
+    # hasta es inclusivo también para columnas DATETIME
+    if desde is not None:
+        query = query.filter(columna >= desde)
+    if hasta is not None:
+        query = query.filter(columna < hasta + timedelta(days=1))
+    return query
 
 # ------------------------------
 # Endpoints: RAW
 # ------------------------------
 @app.post("/api/raw/", status_code=201)
-def crear_raw(entry: RawEntryIn, db: Session = Depends(get_db)):
+async def crear_raw(entry: RawEntryIn, db: AsyncSession = Depends(get_async_db),
+                    idempotency_key: Optional[str] = Header(None)):
+    # La lógica de ingesta es la misma (sync); run_sync la corre sobre la conexión asíncrona
+    return await db.run_sync(_crear_raw, entry, idempotency_key)
+
+def _crear_raw(db: Session, entry: RawEntryIn, idempotency_key: Optional[str]):
     from crud import crear_entrada
+    previa = idempotencia.buscar(db, idempotency_key, "/api/raw/", entry)
+    if previa is not None:
+        return previa
     payload = {
         "tipo": entry.tipo,
         "descripcion": entry.descripcion,
@@ -169,15 +98,33 @@ def crear_raw(entry: RawEntryIn, db: Session = Depends(get_db)):
         "fecha": entry.fecha,
     }
     try:
-        nueva = crear_entrada(db, payload)
-        return serialize_row(nueva)
+        nueva = crear_entrada(db, payload, confirmar=False)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error guardando raw: {e}")
+    return idempotencia.confirmar(db, idempotency_key, "/api/raw/", entry, serialize_row(nueva))
+
+@app.post("/api/raw/bulk", status_code=201)
+async def crear_raw_masivo(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # Carga masiva: arreglo JSON, NDJSON (application/x-ndjson) o CSV (text/csv) con
+    # las columnas de RawEntryIn; devuelve raw_id o error por fila, en el orden recibido.
+    # Lectura y validación (CPU) van al threadpool para no frenar el event loop
+    cuerpo = await request.body()
+    filas = await run_in_threadpool(ingesta.leer_filas, cuerpo, request.headers.get("content-type"))
+    validas, resultados = await run_in_threadpool(ingesta.validar, filas, RawEntryIn)
+    resumen = await db.run_sync(ingesta.insertar, validas, resultados)
+    return serializadores.RespuestaJSON(resumen, status_code=201)
 
 @app.get("/api/raw/")
-def listar_raw(db: Session = Depends(get_db)):
-    raws = db.query(models.RawData).order_by(models.RawData.id.desc()).all()
-    return [serialize_row(r) for r in raws]
+async def listar_raw(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                     after: Optional[int] = None, tipo: Optional[str] = None,
+                     desde: Optional[date] = None, hasta: Optional[date] = None, fields: Optional[str] = None,
+                     db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.RawData, fields)
+    query = select(*ser.columnas)
+    if tipo:
+        query = query.filter(models.RawData.tipo == tipo)
+    query = filtrar_fechas(query, models.RawData.fecha, desde, hasta)
+    return await paginar(db, query, models.RawData.id, limit, after, ser)
 
 @app.get("/api/raw/{id}/")
 def obtener_raw(id: int, db: Session = Depends(get_db)):
@@ -195,6 +142,16 @@ def actualizar_raw(id: int, entry: RawEntryIn, db: Session = Depends(get_db)):
     item.descripcion = entry.descripcion
     item.monto = entry.monto
     item.fecha = entry.fecha
+    # Marca de cambio para que el ETL incremental vuelva a leer la fila
+    item.actualizado_en = datetime.utcnow()
+    # Y de vuelta a la cola de trabajo del ETL
+    item.etl_estado = "pendiente"
+    item.etl_lease_owner = None
+    item.etl_lease_expira = None
+    # Si estaba aparcada en el dead letter, la próxima corrida la reintenta
+    db.query(models.EtlDeadLetter).filter(models.EtlDeadLetter.raw_id == id).update(
+        {"estado": "reintentar"}, synchronize_session=False
+    )
     db.commit()
     db.refresh(item)
     return serialize_row(item)
@@ -212,7 +169,11 @@ def eliminar_raw(id: int, db: Session = Depends(get_db)):
 # Endpoints: Factura de Venta
 # ------------------------------
 @app.post("/api/facturas/venta/", status_code=201)
-def crear_factura_venta(fv: FacturaVentaIn, db: Session = Depends(get_db)):
+def crear_factura_venta(fv: FacturaVentaIn, db: Session = Depends(get_db),
+                        idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/facturas/venta/", fv)
+    if previa is not None:
+        return previa
     # Primero guardar en raw_data
     raw_entry = models.RawData(
         tipo="ingreso",
@@ -222,17 +183,19 @@ def crear_factura_venta(fv: FacturaVentaIn, db: Session = Depends(get_db)):
         tabla_destino="facturas_venta"
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/facturas/venta/", fv, {
         "message": "Datos registrados en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "factura_venta"
-    }
+    })
 @app.post("/api/facturas/venta/con-items/", status_code=201)
-def crear_factura_venta_con_items(fv: FacturaVentaCreateIn, db: Session = Depends(get_db)):
+def crear_factura_venta_con_items(fv: FacturaVentaCreateIn, db: Session = Depends(get_db),
+                                  idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/facturas/venta/con-items/", fv)
+    if previa is not None:
+        return previa
     payload_items = [i.model_dump() for i in fv.items]
     raw_entry = models.RawData(
         tipo="ingreso",
@@ -243,19 +206,26 @@ def crear_factura_venta_con_items(fv: FacturaVentaCreateIn, db: Session = Depend
         metadata_json=json.dumps({"items": payload_items})
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/facturas/venta/con-items/", fv, {
         "message": "Factura (con items) registrada en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "factura_venta"
-    }
+    })
 
 @app.get("/api/facturas/venta/")
-def listar_facturas_venta(db: Session = Depends(get_db)):
-    fv = db.query(models.FacturaVenta).order_by(models.FacturaVenta.id.desc()).all()
-    return [serialize_row(x) for x in fv]
+async def listar_facturas_venta(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                                after: Optional[int] = None, cliente: Optional[str] = None,
+                                desde: Optional[date] = None, hasta: Optional[date] = None,
+                                fields: Optional[str] = None,
+                                db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.FacturaVenta, fields)
+    query = select(*ser.columnas)
+    if cliente:
+        query = query.filter(models.FacturaVenta.cliente == cliente)
+    query = filtrar_fechas(query, models.FacturaVenta.fecha, desde, hasta)
+    return await paginar(db, query, models.FacturaVenta.id, limit, after, ser)
 
 @app.get("/api/facturas/venta/{factura_id}/items")
 def listar_items_factura_venta(factura_id: int, db: Session = Depends(get_db)):
@@ -298,7 +268,11 @@ def eliminar_factura_venta(id: int, db: Session = Depends(get_db)):
 # Endpoints: Factura de Compra
 # ------------------------------
 @app.post("/api/facturas/compra/", status_code=201)
-def crear_factura_compra(fc: FacturaCompraIn, db: Session = Depends(get_db)):
+def crear_factura_compra(fc: FacturaCompraIn, db: Session = Depends(get_db),
+                         idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/facturas/compra/", fc)
+    if previa is not None:
+        return previa
     # Primero guardar en raw_data
     raw_entry = models.RawData(
         tipo="gasto",
@@ -308,18 +282,20 @@ def crear_factura_compra(fc: FacturaCompraIn, db: Session = Depends(get_db)):
         tabla_destino="facturas_compra"
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/facturas/compra/", fc, {
         "message": "Datos registrados en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "factura_compra"
-    }
+    })
 
 @app.post("/api/facturas/compra/con-items/", status_code=201)
-def crear_factura_compra_con_items(fc: FacturaCompraCreateIn, db: Session = Depends(get_db)):
+def crear_factura_compra_con_items(fc: FacturaCompraCreateIn, db: Session = Depends(get_db),
+                                   idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/facturas/compra/con-items/", fc)
+    if previa is not None:
+        return previa
     payload_items = [i.model_dump() for i in fc.items]
     raw_entry = models.RawData(
         tipo="gasto",
@@ -330,19 +306,26 @@ def crear_factura_compra_con_items(fc: FacturaCompraCreateIn, db: Session = Depe
         metadata_json=json.dumps({"items": payload_items})
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/facturas/compra/con-items/", fc, {
         "message": "Factura de compra (con items) registrada en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "factura_compra"
-    }
+    })
 
 @app.get("/api/facturas/compra/")
-def listar_facturas_compra(db: Session = Depends(get_db)):
-    fc = db.query(models.FacturaCompra).order_by(models.FacturaCompra.id.desc()).all()
-    return [serialize_row(x) for x in fc]
+async def listar_facturas_compra(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                                 after: Optional[int] = None, proveedor: Optional[str] = None,
+                                 desde: Optional[date] = None, hasta: Optional[date] = None,
+                                 fields: Optional[str] = None,
+                                 db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.FacturaCompra, fields)
+    query = select(*ser.columnas)
+    if proveedor:
+        query = query.filter(models.FacturaCompra.proveedor == proveedor)
+    query = filtrar_fechas(query, models.FacturaCompra.fecha, desde, hasta)
+    return await paginar(db, query, models.FacturaCompra.id, limit, after, ser)
 
 @app.get("/api/facturas/compra/{factura_id}/items")
 def listar_items_factura_compra(factura_id: int, db: Session = Depends(get_db)):
@@ -404,14 +387,15 @@ def crear_template_fr(t: RecurringTemplateIn, db: Session = Depends(get_db)):
     }
 
 @app.get("/api/facturas/recurrentes/template/")
-def listar_templates_fr(db: Session = Depends(get_db)):
-    temps = db.query(models.FacturaRecurrenteTemplate).order_by(models.FacturaRecurrenteTemplate.id.desc()).all()
-    return [
-        {"id": t.id, "cliente": t.cliente, "descripcion": t.descripcion,
-         "monto": float(t.monto), "frecuencia": t.frecuencia,
-         "siguiente_generacion": t.siguiente_generacion.isoformat()}
-        for t in temps
-    ]
+async def listar_templates_fr(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                              after: Optional[int] = None, cliente: Optional[str] = None,
+                              fields: Optional[str] = None,
+                              db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.FacturaRecurrenteTemplate, fields)
+    query = select(*ser.columnas)
+    if cliente:
+        query = query.filter(models.FacturaRecurrenteTemplate.cliente == cliente)
+    return await paginar(db, query, models.FacturaRecurrenteTemplate.id, limit, after, ser)
 
 @app.get("/api/facturas/recurrentes/template/{id}/")
 def obtener_template_fr(id: int, db: Session = Depends(get_db)):
@@ -454,7 +438,11 @@ def eliminar_template_fr(id: int, db: Session = Depends(get_db)):
 # Endpoint: Pagos Recibidos
 # ------------------------------
 @app.post("/api/pagos/recibidos/", status_code=201)
-def crear_pago_recibido(p: PagoRecibidoIn, db: Session = Depends(get_db)):
+def crear_pago_recibido(p: PagoRecibidoIn, db: Session = Depends(get_db),
+                        idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/pagos/recibidos/", p)
+    if previa is not None:
+        return previa
     # Validar existencia de factura_venta_id
     if not db.query(models.FacturaVenta).get(p.factura_venta_id):
         raise HTTPException(status_code=422, detail="Factura de venta no existe")
@@ -468,20 +456,26 @@ def crear_pago_recibido(p: PagoRecibidoIn, db: Session = Depends(get_db)):
         tabla_destino="pagos_recibidos"
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/pagos/recibidos/", p, {
         "message": "Datos registrados en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "pago_recibido"
-    }
+    })
 
 @app.get("/api/pagos/recibidos/")
-def listar_pagos_recibidos(db: Session = Depends(get_db)):
-    pagos = db.query(models.PagoRecibido).order_by(models.PagoRecibido.id.desc()).all()
-    return [serialize_row(p) for p in pagos]
+async def listar_pagos_recibidos(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                                 after: Optional[int] = None, factura_venta_id: Optional[int] = None,
+                                 desde: Optional[date] = None, hasta: Optional[date] = None,
+                                 fields: Optional[str] = None,
+                                 db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.PagoRecibido, fields)
+    query = select(*ser.columnas)
+    if factura_venta_id is not None:
+        query = query.filter(models.PagoRecibido.factura_venta_id == factura_venta_id)
+    query = filtrar_fechas(query, models.PagoRecibido.fecha, desde, hasta)
+    return await paginar(db, query, models.PagoRecibido.id, limit, after, ser)
 
 @app.get("/api/pagos/recibidos/{id}/")
 def obtener_pago_recibido(id: int, db: Session = Depends(get_db)):
@@ -517,12 +511,24 @@ def eliminar_pago_recibido(id: int, db: Session = Depends(get_db)):
 # Endpoint: Órdenes de Compra
 # ------------------------------
 @app.get("/api/ordenes/compra/")
-def listar_ordenes_compra(db: Session = Depends(get_db)):
-    ordenes = db.query(models.OrdenesCompra).order_by(models.OrdenesCompra.id.desc()).all()
-    return [serialize_row(o) for o in ordenes]
+async def listar_ordenes_compra(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                                after: Optional[int] = None, proveedor: Optional[str] = None,
+                                desde: Optional[date] = None, hasta: Optional[date] = None,
+                                fields: Optional[str] = None,
+                                db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.OrdenesCompra, fields)
+    query = select(*ser.columnas)
+    if proveedor:
+        query = query.filter(models.OrdenesCompra.proveedor == proveedor)
+    query = filtrar_fechas(query, models.OrdenesCompra.fecha, desde, hasta)
+    return await paginar(db, query, models.OrdenesCompra.id, limit, after, ser)
 
 @app.post("/api/ordenes/compra/", status_code=201)
-def crear_orden_compra(oc: FacturaCompraIn, db: Session = Depends(get_db)):
+def crear_orden_compra(oc: FacturaCompraIn, db: Session = Depends(get_db),
+                       idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/ordenes/compra/", oc)
+    if previa is not None:
+        return previa
     # Primero guardar en raw_data
     raw_entry = models.RawData(
         tipo="orden_compra",
@@ -532,15 +538,13 @@ def crear_orden_compra(oc: FacturaCompraIn, db: Session = Depends(get_db)):
         tabla_destino="ordenes_compra"
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/ordenes/compra/", oc, {
         "message": "Datos registrados en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "orden_compra"
-    }
+    })
 
 @app.get("/api/ordenes/compra/{id}/")
 def obtener_orden_compra(id: int, db: Session = Depends(get_db)):
@@ -575,7 +579,11 @@ def eliminar_orden_compra(id: int, db: Session = Depends(get_db)):
 # Endpoint: Pagos a Proveedor
 # ------------------------------
 @app.post("/api/pagos/proveedor/", status_code=201)
-def crear_pago_proveedor(p: PagoProveedorIn, db: Session = Depends(get_db)):
+def crear_pago_proveedor(p: PagoProveedorIn, db: Session = Depends(get_db),
+                         idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/pagos/proveedor/", p)
+    if previa is not None:
+        return previa
     # Validar existencia de factura_compra_id o orden_compra_id
     if p.factura_compra_id and not db.query(models.FacturaCompra).get(p.factura_compra_id):
         raise HTTPException(status_code=422, detail="Factura de compra no existe")
@@ -593,20 +601,29 @@ def crear_pago_proveedor(p: PagoProveedorIn, db: Session = Depends(get_db)):
         tabla_destino="pagos_proveedor"
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/pagos/proveedor/", p, {
         "message": "Datos registrados en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "pago_proveedor"
-    }
+    })
 
 @app.get("/api/pagos/proveedor/")
-def listar_pagos_proveedor(db: Session = Depends(get_db)):
-    pagos = db.query(models.PagoProveedor).order_by(models.PagoProveedor.id.desc()).all()
-    return [serialize_row(p) for p in pagos]
+async def listar_pagos_proveedor(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                                 after: Optional[int] = None, factura_compra_id: Optional[int] = None,
+                                 orden_compra_id: Optional[int] = None,
+                                 desde: Optional[date] = None, hasta: Optional[date] = None,
+                                 fields: Optional[str] = None,
+                                 db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.PagoProveedor, fields)
+    query = select(*ser.columnas)
+    if factura_compra_id is not None:
+        query = query.filter(models.PagoProveedor.factura_compra_id == factura_compra_id)
+    if orden_compra_id is not None:
+        query = query.filter(models.PagoProveedor.orden_compra_id == orden_compra_id)
+    query = filtrar_fechas(query, models.PagoProveedor.fecha, desde, hasta)
+    return await paginar(db, query, models.PagoProveedor.id, limit, after, ser)
 
 @app.get("/api/pagos/proveedor/{id}/")
 def obtener_pago_proveedor(id: int, db: Session = Depends(get_db)):
@@ -645,7 +662,11 @@ def eliminar_pago_proveedor(id: int, db: Session = Depends(get_db)):
 # Endpoints: Clientes, Productos, Items
 # ------------------------------
 @app.post("/api/clientes/", status_code=201)
-def crear_cliente(c: ClienteIn, db: Session = Depends(get_db)):
+def crear_cliente(c: ClienteIn, db: Session = Depends(get_db),
+                  idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/clientes/", c)
+    if previa is not None:
+        return previa
     # Primero guardar en raw_data
     raw_entry = models.RawData(
         tipo="cliente",
@@ -656,20 +677,25 @@ def crear_cliente(c: ClienteIn, db: Session = Depends(get_db)):
         metadata_json=json.dumps(c.dict())
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/clientes/", c, {
         "message": "Cliente registrado en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "cliente",
         "nombre": c.nombre
-    }
+    })
 
 @app.get("/api/clientes/")
-def listar_clientes(db: Session = Depends(get_db)):
-    return [serialize_row(x) for x in db.query(models.Cliente).all()]
+async def listar_clientes(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                          after: Optional[int] = None, nombre: Optional[str] = None, fields: Optional[str] = None,
+                          db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.Cliente, fields)
+    query = select(*ser.columnas)
+    if nombre:
+        # Por la columna generada e indexada LOWER(TRIM(nombre))
+        query = query.filter(models.Cliente.nombre_norm == nombre.strip().lower())
+    return await paginar(db, query, models.Cliente.id, limit, after, ser)
 
 @app.get("/api/clientes/{id}/")
 def obtener_cliente(id: int, db: Session = Depends(get_db)):
@@ -702,7 +728,11 @@ def eliminar_cliente(id: int, db: Session = Depends(get_db)):
     return {"ok": True}
 
 @app.post("/api/proveedores/", status_code=201)
-def crear_proveedor(p: ProveedorIn, db: Session = Depends(get_db)):
+def crear_proveedor(p: ProveedorIn, db: Session = Depends(get_db),
+                    idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/proveedores/", p)
+    if previa is not None:
+        return previa
     # Primero guardar en raw_data
     raw_entry = models.RawData(
         tipo="proveedor",
@@ -713,20 +743,25 @@ def crear_proveedor(p: ProveedorIn, db: Session = Depends(get_db)):
         metadata_json=json.dumps(p.dict())
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/proveedores/", p, {
         "message": "Proveedor registrado en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "proveedor",
         "nombre": p.nombre
-    }
+    })
 
 @app.get("/api/proveedores/")
-def listar_proveedores(db: Session = Depends(get_db)):
-    return [serialize_row(x) for x in db.query(models.Proveedor).all()]
+async def listar_proveedores(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                             after: Optional[int] = None, nombre: Optional[str] = None, fields: Optional[str] = None,
+                             db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.Proveedor, fields)
+    query = select(*ser.columnas)
+    if nombre:
+        # Por la columna generada e indexada LOWER(TRIM(nombre))
+        query = query.filter(models.Proveedor.nombre_norm == nombre.strip().lower())
+    return await paginar(db, query, models.Proveedor.id, limit, after, ser)
 
 @app.get("/api/proveedores/{id}/")
 def obtener_proveedor(id: int, db: Session = Depends(get_db)):
@@ -761,7 +796,11 @@ def eliminar_proveedor(id: int, db: Session = Depends(get_db)):
     return {"ok": True}
 
 @app.post("/api/productos/", status_code=201)
-def crear_producto(p: ProductoIn, db: Session = Depends(get_db)):
+def crear_producto(p: ProductoIn, db: Session = Depends(get_db),
+                   idempotency_key: Optional[str] = Header(None)):
+    previa = idempotencia.buscar(db, idempotency_key, "/api/productos/", p)
+    if previa is not None:
+        return previa
     # Primero guardar en raw_data
     raw_entry = models.RawData(
         tipo="producto",
@@ -772,20 +811,25 @@ def crear_producto(p: ProductoIn, db: Session = Depends(get_db)):
         metadata_json=json.dumps({k: str(v) if v is not None else None for k, v in p.dict().items()})
     )
     db.add(raw_entry)
-    db.commit()
-    db.refresh(raw_entry)
-    
-    return {
+    db.flush()
+    return idempotencia.confirmar(db, idempotency_key, "/api/productos/", p, {
         "message": "Producto registrado en cola de procesamiento",
         "raw_id": raw_entry.id,
         "status": "pending_etl",
         "tipo": "producto",
         "nombre": p.nombre
-    }
+    })
 
 @app.get("/api/productos/")
-def listar_productos(db: Session = Depends(get_db)):
-    return [serialize_row(x) for x in db.query(models.Producto).all()]
+async def listar_productos(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                           after: Optional[int] = None, nombre: Optional[str] = None, fields: Optional[str] = None,
+                           db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.Producto, fields)
+    query = select(*ser.columnas)
+    if nombre:
+        # Por la columna generada e indexada LOWER(TRIM(nombre))
+        query = query.filter(models.Producto.nombre_norm == nombre.strip().lower())
+    return await paginar(db, query, models.Producto.id, limit, after, ser)
 
 @app.get("/api/productos/{id}/")
 def obtener_producto(id: int, db: Session = Depends(get_db)):
@@ -834,21 +878,82 @@ def crear_item(item: FacturaItemIn, db: Session = Depends(get_db)):
     return serialize_row(nuevo)
 
 @app.get("/api/factura-items/")
-def listar_items(db: Session = Depends(get_db)):
-    return [serialize_row(x) for x in db.query(models.FacturaItem).all()]
+async def listar_items(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                       after: Optional[int] = None, factura_tipo: Optional[Literal["venta", "compra"]] = None,
+                       producto_id: Optional[int] = None, fields: Optional[str] = None,
+                       db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.FacturaItem, fields)
+    query = select(*ser.columnas)
+    if factura_tipo:
+        query = query.filter(models.FacturaItem.factura_tipo == factura_tipo)
+    if producto_id is not None:
+        query = query.filter(models.FacturaItem.producto_id == producto_id)
+    return await paginar(db, query, models.FacturaItem.id, limit, after, ser)
 
 # ------------------------------
 # Endpoints: Pipeline y Health
 # ------------------------------
-@app.post("/api/pipeline/run")
-def ejecutar_pipeline_endpoint():
-    resumen = run_etl()
-    return resumen
+@app.post("/api/pipeline/run", status_code=202)
+def ejecutar_pipeline_endpoint(incremental: bool = True):
+    # incremental=false fuerza un recorrido completo de raw_data.
+    # No espera al ETL: devuelve el trabajo encolado (o el ya encolado al que se une)
+    trabajo, coalescido = pipeline_jobs.encolar(incremental=incremental)
+    return {
+        "job_id": trabajo["id"],
+        "estado": trabajo["estado"],
+        "coalescido": coalescido,
+        "url": f"/api/pipeline/jobs/{trabajo['id']}",
+    }
+
+@app.post("/api/pipeline/run/registros")
+def ejecutar_pipeline_registros(body: PipelineRegistrosIn):
+    # Solo los raw_id indicados, en la misma petición (milisegundos, no depende del tamaño de raw_data)
+    return run_etl(raw_ids=body.raw_ids)
+
+@app.get("/api/pipeline/jobs/{job_id}")
+def estado_pipeline_job(job_id: str):
+    trabajo = pipeline_jobs.obtener(job_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return trabajo
+
+@app.get("/api/pipeline/dead-letter/")
+async def listar_dead_letter(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                             after: Optional[int] = None, estado: Optional[str] = None,
+                             fields: Optional[str] = None,
+                             db: AsyncSession = Depends(get_async_db)):
+    # Filas de raw_data que el ETL no pudo transformar; se corrigen con PUT /api/raw/{id}/
+    ser = serializadores.proyectar(models.EtlDeadLetter, fields)
+    query = select(*ser.columnas)
+    if estado:
+        query = query.filter(models.EtlDeadLetter.estado == estado)
+    return await paginar(db, query, models.EtlDeadLetter.raw_id, limit, after, ser)
 
 @app.get("/api/cleaned/")
-def obtener_cleaned(db: Session = Depends(get_db)):
-    rows = db.query(models.CleanedData).order_by(models.CleanedData.id.desc()).all()
-    return [serialize_row(r) for r in rows]
+async def obtener_cleaned(limit: int = Query(LIMITE_PAGINA, ge=1, le=LIMITE_MAX_PAGINA),
+                          after: Optional[int] = None, tipo: Optional[str] = None,
+                          desde: Optional[date] = None, hasta: Optional[date] = None, fields: Optional[str] = None,
+                          db: AsyncSession = Depends(get_async_db)):
+    ser = serializadores.proyectar(models.CleanedData, fields)
+    query = select(*ser.columnas)
+    if tipo:
+        query = query.filter(models.CleanedData.tipo == tipo)
+    query = filtrar_fechas(query, models.CleanedData.fecha, desde, hasta)
+    return await paginar(db, query, models.CleanedData.id, limit, after, ser)
+
+# ------------------------------
+# Endpoints: Exportación
+# ------------------------------
+@app.get("/api/export/{tabla}")
+def exportar_tabla(tabla: Literal[tuple(exportar.TABLAS)], formato: Literal["ndjson", "csv"] = "ndjson",
+                   desde: Optional[date] = None, hasta: Optional[date] = None):
+    # Tabla completa (o un rango de fechas) en streaming, ordenada por id: para
+    # exportaciones contables y conciliaciones que no caben en una página
+    return StreamingResponse(
+        exportar.exportar(tabla, formato, desde, hasta),
+        media_type=exportar.TIPOS_MEDIA[formato],
+        headers={"Content-Disposition": f'attachment; filename="{tabla}.{formato}"'},
+    )
 
 # ------------------------------
 # Endpoints: Reportes
@@ -891,6 +996,12 @@ def obtener_resumen_financiero(db: Session = Depends(get_db)):
         "fecha_reporte": datetime.utcnow().isoformat()
     }
 
+@app.get("/api/reportes/mensual/")
+def obtener_reporte_mensual(tipo: Literal[tuple(reportes.FACTURAS)], meses: int = Query(12, ge=1, le=60),
+                            db: Session = Depends(get_db)):
+    # KPIs y serie mensual del dashboard, agregados en la base
+    return reportes.resumen_mensual(db, tipo, meses)
+
 @app.get("/api/reportes/facturas-pendientes/")
 def obtener_facturas_pendientes(db: Session = Depends(get_db)):
     from sqlalchemy import func, and_
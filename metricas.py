@@ -0,0 +1,137 @@
+import contextvars
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+# Corrida y etapa activas; los hilos de carga paralela las heredan vía copy_context()
+_corrida = contextvars.ContextVar("metricas_etl_corrida", default=None)
+_etapa = contextvars.ContextVar("metricas_etl_etapa", default=None)
+_PAGINA = resource.getpagesize()
+
+
+def pico_memoria_mb():
+    """Pico de memoria residente del proceso (ru_maxrss: KB en Linux, bytes en macOS)."""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        pico = pico / 1024
+    return round(pico / 1024, 2)
+
+
+def memoria_actual_mb():
+    """Memoria residente actual del proceso (/proc/self/statm); None donde no existe (macOS, Windows)."""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return round(paginas * _PAGINA / 1024 / 1024, 2)
+
+
+class _Medicion:
+    def __init__(self, filas=0):
+        self.filas = filas
+
+
+class MetricasEtl:
+    """Tiempo, filas, round trips a la base y memoria por etapa de una corrida.
+
+    Los round trips se cuentan con el evento before_cursor_execute del engine
+    instrumentado: cada execute/executemany cuenta como uno (un executemany
+    que PyMySQL reescribe como INSERT multi-fila es una sola sentencia).
+
+    La memoria es la RSS actual, no ru_maxrss (que nunca baja y repetiría el
+    pico de la etapa más pesada en todas las siguientes): `rss_mb` es la
+    mayor RSS al salir de la etapa y `rss_delta_mb` lo máximo que creció
+    durante una ejecución de la etapa. Con carga paralela la RSS es la de
+    todo el proceso, así que el delta de una etapa incluye a las que corren
+    a la vez. El pico de la corrida va aparte (peak_memory_mb del log).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inicio = time.perf_counter()
+        self.etapas = {}
+
+    def _registro(self, nombre):
+        return self.etapas.setdefault(nombre, {
+            "segundos": 0.0, "filas": 0, "round_trips": 0, "rss_mb": None, "rss_delta_mb": None, "veces": 0,
+        })
+
+    def sumar_round_trip(self, nombre):
+        with self._lock:
+            self._registro(nombre)["round_trips"] += 1
+
+    def _acumular(self, nombre, segundos, filas, rss_inicio=None):
+        rss = memoria_actual_mb()
+        with self._lock:
+            reg = self._registro(nombre)
+            reg["segundos"] += segundos
+            reg["filas"] += filas
+            reg["veces"] += 1
+            if rss is not None:
+                reg["rss_mb"] = max(reg["rss_mb"] or 0.0, rss)
+                if rss_inicio is not None:
+                    reg["rss_delta_mb"] = round(max(reg["rss_delta_mb"] or 0.0, rss - rss_inicio), 2)
+
+    @contextmanager
+    def activar(self):
+        token = _corrida.set(self)
+        try:
+            yield self
+        finally:
+            _corrida.reset(token)
+
+    def resumen(self):
+        with self._lock:
+            etapas = {}
+            for nombre, reg in self.etapas.items():
+                segundos = reg["segundos"]
+                etapas[nombre] = {
+                    "segundos": round(segundos, 4),
+                    "filas": reg["filas"],
+                    "filas_por_seg": round(reg["filas"] / segundos, 1) if segundos and reg["filas"] else None,
+                    "round_trips": reg["round_trips"],
+                    "rss_mb": reg["rss_mb"],
+                    "rss_delta_mb": reg["rss_delta_mb"],
+                    "veces": reg["veces"],
+                }
+        return {
+            "duracion_segundos": round(time.perf_counter() - self._inicio, 4),
+            "round_trips_total": sum(e["round_trips"] for e in etapas.values()),
+            "etapas": etapas,
+        }
+
+
+@contextmanager
+def etapa(nombre, filas=0):
+    """Mide una etapa de la corrida activa; sin corrida activa no hace nada.
+
+    Devuelve un objeto con `.filas` para sumar filas una vez conocidas.
+    """
+    medicion = _Medicion(filas)
+    metricas = _corrida.get()
+    if metricas is None:
+        yield medicion
+        return
+    token = _etapa.set(nombre)
+    rss_inicio = memoria_actual_mb()
+    inicio = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        _etapa.reset(token)
+        metricas._acumular(nombre, time.perf_counter() - inicio, medicion.filas, rss_inicio)
+
+
+def instrumentar(engine):
+    """Cuenta las sentencias enviadas por `engine` en la etapa activa."""
+    @event.listens_for(engine, "before_cursor_execute")
+    def _contar(conn, cursor, statement, parameters, context, executemany):
+        metricas = _corrida.get()
+        nombre = _etapa.get()
+        if metricas is not None and nombre is not None:
+            metricas.sumar_round_trip(nombre)
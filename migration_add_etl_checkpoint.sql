@@ -0,0 +1,14 @@
+-- Migration script para commits por chunk con checkpoints reanudables
+-- Execute this script if the table doesn't exist yet
+
+CREATE TABLE IF NOT EXISTS etl_checkpoint (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    modo VARCHAR(20) NOT NULL,
+    estado VARCHAR(20) NOT NULL DEFAULT 'en_curso',
+    ultimo_raw_id INT NOT NULL DEFAULT 0,
+    ultimo_cambio DATETIME NULL,
+    filas INT NOT NULL DEFAULT 0,
+    iniciado_en DATETIME,
+    actualizado_en DATETIME,
+    INDEX idx_checkpoint_modo_estado (modo, estado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -0,0 +1,8 @@
+-- Migration script para que una corrida solo reanude checkpoints de corridas caídas
+-- Execute this script if the column doesn't exist yet
+
+ALTER TABLE etl_checkpoint
+ADD COLUMN propietario VARCHAR(100) NULL AFTER estado;
+
+-- Verify
+DESCRIBE etl_checkpoint;
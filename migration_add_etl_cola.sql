@@ -0,0 +1,21 @@
+-- Migration script para la cola de trabajo del ETL sobre raw_data
+-- Execute this script if the columns don't exist yet (requiere MySQL 8.0+ por SKIP LOCKED)
+
+ALTER TABLE raw_data
+ADD COLUMN etl_estado VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+ADD COLUMN etl_lease_owner VARCHAR(100) NULL,
+ADD COLUMN etl_lease_expira DATETIME NULL,
+ADD INDEX idx_raw_etl_cola (etl_estado, id);
+
+-- Lo que el ETL ya cargó (tiene hash) o aparcó no vuelve a la cola.
+-- actualizado_en = actualizado_en evita que el cambio cuente como edición para el watermark.
+UPDATE raw_data r
+JOIN etl_hashes h ON h.raw_id = r.id
+SET r.etl_estado = 'procesado', r.actualizado_en = r.actualizado_en;
+
+UPDATE raw_data r
+JOIN etl_dead_letter d ON d.raw_id = r.id AND d.estado = 'aparcada'
+SET r.etl_estado = 'procesado', r.actualizado_en = r.actualizado_en;
+
+-- Verify
+SELECT etl_estado, COUNT(*) FROM raw_data GROUP BY etl_estado;
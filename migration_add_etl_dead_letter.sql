@@ -0,0 +1,13 @@
+-- Migration script para el dead letter del ETL
+-- Execute this script if the table doesn't exist yet
+
+CREATE TABLE IF NOT EXISTS etl_dead_letter (
+    raw_id INT PRIMARY KEY,
+    etapa VARCHAR(50) NOT NULL,
+    error TEXT,
+    intentos INT NOT NULL DEFAULT 1,
+    estado VARCHAR(20) NOT NULL DEFAULT 'aparcada',
+    creado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_dead_letter_estado (estado)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
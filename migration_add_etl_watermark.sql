@@ -0,0 +1,21 @@
+-- Migration script para el ETL incremental (high-water mark)
+-- Execute this script if the column/table doesn't exist yet
+
+-- Marca de cambio en raw_data (la refresca cada UPDATE, p.ej. PUT /api/raw/{id}/)
+ALTER TABLE raw_data
+ADD COLUMN IF NOT EXISTS actualizado_en DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP;
+
+UPDATE raw_data SET actualizado_en = creado_en WHERE actualizado_en IS NULL;
+
+CREATE INDEX idx_raw_actualizado ON raw_data (actualizado_en);
+
+-- Último raw_data.id y última marca de cambio procesados
+CREATE TABLE IF NOT EXISTS etl_watermark (
+    nombre VARCHAR(50) PRIMARY KEY,
+    ultimo_raw_id INT NOT NULL DEFAULT 0,
+    ultimo_cambio DATETIME NULL,
+    actualizado_en DATETIME
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+
+-- Verify
+DESCRIBE raw_data;
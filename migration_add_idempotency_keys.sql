@@ -0,0 +1,13 @@
+-- Migration script para Idempotency-Key en los POST de ingesta
+-- Execute this script if the table doesn't exist yet
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    clave VARCHAR(255) PRIMARY KEY,
+    endpoint VARCHAR(100) NOT NULL,
+    huella CHAR(64) NOT NULL,
+    respuesta_json TEXT NOT NULL,
+    status_code INT NOT NULL,
+    creado_en DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expira_en DATETIME NOT NULL,
+    INDEX idx_idempotency_expira (expira_en)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
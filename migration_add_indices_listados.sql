@@ -0,0 +1,31 @@
+-- Migration script para los índices de los listados paginados de la API
+-- Los endpoints GET /api/.../ paginan por keyset (id < after ORDER BY id DESC)
+-- y filtran por tipo, cliente/proveedor o rango de fechas: con estos índices
+-- cada página es un rango corto del índice y no un recorrido de la tabla.
+
+ALTER TABLE raw_data
+ADD INDEX idx_raw_tipo_id (tipo, id),
+ADD INDEX idx_raw_fecha (fecha);
+
+ALTER TABLE cleaned_data
+ADD INDEX idx_cleaned_tipo_id (tipo, id),
+ADD INDEX idx_cleaned_fecha (fecha);
+
+ALTER TABLE facturas_venta
+ADD INDEX idx_fv_cliente_id (cliente, id),
+ADD INDEX idx_fv_fecha (fecha);
+
+ALTER TABLE facturas_compra
+ADD INDEX idx_fc_proveedor_id (proveedor, id),
+ADD INDEX idx_fc_fecha (fecha);
+
+ALTER TABLE ordenes_compra
+ADD INDEX idx_oc_proveedor_id (proveedor, id),
+ADD INDEX idx_oc_fecha (fecha);
+
+ALTER TABLE pagos_recibidos ADD INDEX idx_pr_fecha (fecha);
+ALTER TABLE pagos_proveedor ADD INDEX idx_pp_fecha (fecha);
+ALTER TABLE factura_items ADD INDEX idx_items_tipo_id (factura_tipo, id);
+
+-- Verify
+SHOW INDEX FROM raw_data;
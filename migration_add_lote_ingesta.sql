@@ -0,0 +1,11 @@
+-- Migration script para la carga masiva POST /api/raw/bulk
+-- Execute this script if the column doesn't exist yet
+
+-- Cada lote insertado se marca con un valor único; los raw_id de sus filas
+-- se recuperan por este índice (no se asume que sean consecutivos)
+ALTER TABLE raw_data
+ADD COLUMN lote_ingesta VARCHAR(32) NULL,
+ADD INDEX idx_raw_lote_ingesta (lote_ingesta);
+
+-- Verify
+SHOW COLUMNS FROM raw_data LIKE 'lote_ingesta';
@@ -0,0 +1,14 @@
+-- Migration script para la carga por lotes de clientes, proveedores y productos
+-- Nombre normalizado (columna generada) con índice para buscar maestros por lote
+
+ALTER TABLE clientes
+ADD COLUMN nombre_norm VARCHAR(150) AS (LOWER(TRIM(nombre))) STORED,
+ADD INDEX idx_clientes_nombre_norm (nombre_norm);
+
+ALTER TABLE proveedores
+ADD COLUMN nombre_norm VARCHAR(150) AS (LOWER(TRIM(nombre))) STORED,
+ADD INDEX idx_proveedores_nombre_norm (nombre_norm);
+
+ALTER TABLE productos
+ADD COLUMN nombre_norm VARCHAR(150) AS (LOWER(TRIM(nombre))) STORED,
+ADD INDEX idx_productos_nombre_norm (nombre_norm);
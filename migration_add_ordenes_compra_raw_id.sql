@@ -0,0 +1,27 @@
+-- Migration script para deduplicar órdenes de compra por raw_id (como las facturas)
+-- Execute this script if the column doesn't exist yet
+
+ALTER TABLE ordenes_compra ADD COLUMN raw_id INT NULL;
+
+-- Backfill: antes el ETL deduplicaba por descripción, monto y fecha, así que
+-- cada orden proviene de la primera fila de raw_data con ese contenido.
+-- Si hay órdenes repetidas con el mismo contenido solo la primera recibe raw_id.
+UPDATE ordenes_compra o
+JOIN (
+    SELECT MIN(id) AS id FROM ordenes_compra GROUP BY descripcion, monto, fecha
+) primera ON primera.id = o.id
+JOIN (
+    SELECT MIN(r.id) AS raw_id, TRIM(r.descripcion) AS descripcion, r.monto, DATE(r.fecha) AS fecha
+    FROM raw_data r
+    WHERE LOWER(r.tipo) = 'orden_compra'
+    GROUP BY TRIM(r.descripcion), r.monto, DATE(r.fecha)
+) r ON r.descripcion = o.descripcion AND r.monto = o.monto AND r.fecha = o.fecha
+SET o.raw_id = r.raw_id
+WHERE o.raw_id IS NULL;
+
+ALTER TABLE ordenes_compra
+ADD CONSTRAINT uq_orden_compra_raw UNIQUE (raw_id),
+ADD CONSTRAINT fk_orden_compra_raw FOREIGN KEY (raw_id) REFERENCES raw_data(id) ON DELETE SET NULL;
+
+-- Verify
+SELECT COUNT(*) AS total, COUNT(raw_id) AS con_raw_id FROM ordenes_compra;
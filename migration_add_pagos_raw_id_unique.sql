@@ -0,0 +1,30 @@
+-- Migration script para deduplicar pagos por raw_id (como facturas y órdenes de compra)
+-- Execute this script once on existing databases
+
+-- Pagos repetidos de una misma fila de raw_data (dos corridas que se solaparon
+-- antes de los leases): se listan y se conserva el primero de cada raw_id.
+SELECT 'pagos_recibidos' AS tabla, raw_id, COUNT(*) AS copias
+FROM pagos_recibidos WHERE raw_id IS NOT NULL GROUP BY raw_id HAVING COUNT(*) > 1
+UNION ALL
+SELECT 'pagos_proveedor', raw_id, COUNT(*)
+FROM pagos_proveedor WHERE raw_id IS NOT NULL GROUP BY raw_id HAVING COUNT(*) > 1;
+
+DELETE p FROM pagos_recibidos p
+JOIN (
+    SELECT raw_id, MIN(id) AS id FROM pagos_recibidos WHERE raw_id IS NOT NULL GROUP BY raw_id
+) primero ON primero.raw_id = p.raw_id
+WHERE p.id <> primero.id;
+
+DELETE p FROM pagos_proveedor p
+JOIN (
+    SELECT raw_id, MIN(id) AS id FROM pagos_proveedor WHERE raw_id IS NOT NULL GROUP BY raw_id
+) primero ON primero.raw_id = p.raw_id
+WHERE p.id <> primero.id;
+
+-- El índice único también sirve la búsqueda por raw_id del ETL (WHERE raw_id IN ...)
+ALTER TABLE pagos_recibidos ADD CONSTRAINT uq_pago_recibido_raw UNIQUE (raw_id);
+ALTER TABLE pagos_proveedor ADD CONSTRAINT uq_pago_proveedor_raw UNIQUE (raw_id);
+
+-- Verify
+SELECT COUNT(*) AS total, COUNT(DISTINCT raw_id) AS raw_ids, COUNT(raw_id) AS con_raw_id FROM pagos_recibidos;
+SELECT COUNT(*) AS total, COUNT(DISTINCT raw_id) AS raw_ids, COUNT(raw_id) AS con_raw_id FROM pagos_proveedor;
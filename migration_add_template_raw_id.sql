@@ -0,0 +1,63 @@
+-- Migration script para deduplicar plantillas de facturas recurrentes por raw_id (como las órdenes de compra)
+-- Execute this script if the column doesn't exist yet. Requiere MySQL 8.0+ (ROW_NUMBER)
+
+ALTER TABLE facturas_recurrentes_template ADD COLUMN raw_id INT NULL;
+
+-- Antes el ETL buscaba la plantilla con `WHERE id = :rid` (el id de la
+-- plantilla contra el raw_id de la fila), así que casi en cada corrida
+-- insertaba otra copia de la plantilla de cada fila factura_recurrente, y el
+-- scheduler generaba una instancia por copia.
+--
+-- Backfill: una plantilla viene del ETL si su descripción y monto coinciden
+-- con los de una fila factura_recurrente de raw_data. Dentro de cada
+-- contenido, la k-ésima plantilla (por id) queda con el raw_id de la
+-- k-ésima fila (por id); las que sobran son copias. Las creadas desde la API
+-- no tienen fila en raw_data: quedan en NULL y no se tocan.
+CREATE TABLE template_raw_backfill AS
+SELECT t.id, t.descripcion, t.monto, t.n, r.raw_id
+FROM (
+    SELECT id, descripcion, monto, ROW_NUMBER() OVER (PARTITION BY descripcion, monto ORDER BY id) AS n
+    FROM facturas_recurrentes_template
+) t
+JOIN (
+    SELECT DISTINCT TRIM(descripcion) AS descripcion, monto
+    FROM raw_data WHERE LOWER(tipo) = 'factura_recurrente'
+) contenido ON contenido.descripcion = t.descripcion AND contenido.monto = t.monto
+LEFT JOIN (
+    SELECT id AS raw_id, TRIM(descripcion) AS descripcion, monto,
+           ROW_NUMBER() OVER (PARTITION BY TRIM(descripcion), monto ORDER BY id) AS n
+    FROM raw_data WHERE LOWER(tipo) = 'factura_recurrente'
+) r ON r.descripcion = t.descripcion AND r.monto = t.monto AND r.n = t.n;
+
+-- Reporte: copias que se eliminan, la plantilla que se conserva y cuántas
+-- instancias generó cada copia (facturas repetidas a revisar)
+SELECT c.id AS copia, k.id AS conserva, c.descripcion, c.monto,
+       (SELECT COUNT(*) FROM facturas_recurrentes_instance i WHERE i.template_id = c.id) AS instancias
+FROM template_raw_backfill c
+JOIN template_raw_backfill k ON k.descripcion = c.descripcion AND k.monto = c.monto AND k.n = 1
+WHERE c.raw_id IS NULL
+ORDER BY k.id, c.id;
+
+-- Las instancias ya generadas no se borran (el FK es ON DELETE CASCADE):
+-- pasan a la plantilla que se conserva
+UPDATE facturas_recurrentes_instance i
+JOIN template_raw_backfill c ON c.id = i.template_id AND c.raw_id IS NULL
+JOIN template_raw_backfill k ON k.descripcion = c.descripcion AND k.monto = c.monto AND k.n = 1
+SET i.template_id = k.id;
+
+DELETE t FROM facturas_recurrentes_template t
+JOIN template_raw_backfill c ON c.id = t.id AND c.raw_id IS NULL;
+
+UPDATE facturas_recurrentes_template t
+JOIN template_raw_backfill b ON b.id = t.id
+SET t.raw_id = b.raw_id
+WHERE b.raw_id IS NOT NULL;
+
+DROP TABLE template_raw_backfill;
+
+ALTER TABLE facturas_recurrentes_template
+ADD CONSTRAINT uq_template_raw UNIQUE (raw_id),
+ADD CONSTRAINT fk_template_raw FOREIGN KEY (raw_id) REFERENCES raw_data(id) ON DELETE SET NULL;
+
+-- Verify
+SELECT COUNT(*) AS total, COUNT(raw_id) AS con_raw_id FROM facturas_recurrentes_template;
@@ -9,6 +9,7 @@ from sqlalchemy import (
     Enum,
     Computed,
     ForeignKey,
+    Index,
     UniqueConstraint
 )
 from sqlalchemy.orm import relationship
@@ -25,6 +26,20 @@ class RawData(Base):
     creado_en = Column(DateTime, default=datetime.utcnow)
     tabla_destino = Column(String(100))
     metadata_json = Column(Text, nullable=True)
+    # Marca de cambio para el ETL incremental (se refresca en cada UPDATE)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    # Cola de trabajo del ETL: 'pendiente' -> 'en_proceso' (lease de un worker) -> 'procesado'
+    etl_estado = Column(String(20), nullable=False, default="pendiente", server_default="pendiente")
+    etl_lease_owner = Column(String(100), nullable=True)
+    etl_lease_expira = Column(DateTime, nullable=True)
+    # Marca del lote de POST /api/raw/bulk que insertó la fila (para recuperar sus ids)
+    lote_ingesta = Column(String(32), nullable=True, index=True)
+    __table_args__ = (
+        Index("idx_raw_etl_cola", "etl_estado", "id"),
+        # Listados paginados por id con filtro por tipo o por rango de fechas
+        Index("idx_raw_tipo_id", "tipo", "id"),
+        Index("idx_raw_fecha", "fecha"),
+    )
 
 class CleanedData(Base):
     __tablename__ = "cleaned_data"
@@ -36,6 +51,58 @@ class CleanedData(Base):
     creado_en = Column(DateTime)
     validado_por = Column(String(100))
     tabla_destino = Column(String(100))
+    __table_args__ = (
+        Index("idx_cleaned_tipo_id", "tipo", "id"),
+        Index("idx_cleaned_fecha", "fecha"),
+    )
+
+class EtlWatermark(Base):
+    __tablename__ = "etl_watermark"
+    nombre = Column(String(50), primary_key=True)
+    ultimo_raw_id = Column(Integer, nullable=False, default=0)
+    ultimo_cambio = Column(DateTime, nullable=True)
+    actualizado_en = Column(DateTime, default=datetime.utcnow)
+
+class EtlHash(Base):
+    __tablename__ = "etl_hashes"
+    raw_id = Column(Integer, primary_key=True)
+    record_hash = Column(String(64), index=True)
+
+class EtlCheckpoint(Base):
+    __tablename__ = "etl_checkpoint"
+    id = Column(Integer, primary_key=True, index=True)
+    modo = Column(String(20), nullable=False)
+    estado = Column(String(20), nullable=False, default="en_curso")
+    propietario = Column(String(100), nullable=True)
+    ultimo_raw_id = Column(Integer, nullable=False, default=0)
+    ultimo_cambio = Column(DateTime, nullable=True)
+    filas = Column(Integer, nullable=False, default=0)
+    iniciado_en = Column(DateTime, default=datetime.utcnow)
+    actualizado_en = Column(DateTime, default=datetime.utcnow)
+    __table_args__ = (Index("idx_checkpoint_modo_estado", "modo", "estado"),)
+
+class EtlDeadLetter(Base):
+    __tablename__ = "etl_dead_letter"
+    raw_id = Column(Integer, primary_key=True)
+    etapa = Column(String(50), nullable=False)
+    error = Column(Text)
+    intentos = Column(Integer, nullable=False, default=1)
+    # 'aparcada': fuera de la extracción; 'reintentar': corregida vía PUT /api/raw/{id}/
+    # 'espera': le falta una referencia (factura, orden, producto); se reintenta sola
+    estado = Column(String(20), nullable=False, default="aparcada", index=True)
+    creado_en = Column(DateTime, default=datetime.utcnow)
+    actualizado_en = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class IdempotencyKey(Base):
+    # Respuesta de un POST de ingesta por Idempotency-Key: los reintentos la reciben sin volver a insertar
+    __tablename__ = "idempotency_keys"
+    clave = Column(String(255), primary_key=True)
+    endpoint = Column(String(100), nullable=False)
+    huella = Column(String(64), nullable=False)
+    respuesta_json = Column(Text, nullable=False)
+    status_code = Column(Integer, nullable=False)
+    creado_en = Column(DateTime, default=datetime.utcnow)
+    expira_en = Column(DateTime, nullable=False, index=True)
 
 class FacturaRecurrenteTemplate(Base):
     __tablename__ = "facturas_recurrentes_template"
@@ -45,6 +112,8 @@ class FacturaRecurrenteTemplate(Base):
     monto = Column(DECIMAL(10, 2))
     frecuencia = Column(String(50))
     siguiente_generacion = Column(DateTime)
+    raw_id = Column(Integer)
+    __table_args__ = (UniqueConstraint("raw_id", name="uq_template_raw"),)
 
 class FacturaRecurrenteInstance(Base):
     __tablename__ = "facturas_recurrentes_instance"
@@ -67,7 +136,11 @@ class FacturaVenta(Base):
     fecha = Column(Date)
     creado_en = Column(DateTime, default=datetime.utcnow)
     raw_id = Column(Integer)
-    __table_args__ = (UniqueConstraint("raw_id", name="uq_factura_venta_raw"),)
+    __table_args__ = (
+        UniqueConstraint("raw_id", name="uq_factura_venta_raw"),
+        Index("idx_fv_cliente_id", "cliente", "id"),
+        Index("idx_fv_fecha", "fecha"),
+    )
 
 class FacturaCompra(Base):
     __tablename__ = "facturas_compra"
@@ -78,7 +151,11 @@ class FacturaCompra(Base):
     fecha = Column(Date)
     creado_en = Column(DateTime, default=datetime.utcnow)
     raw_id = Column(Integer)
-    __table_args__ = (UniqueConstraint("raw_id", name="uq_factura_compra_raw"),)
+    __table_args__ = (
+        UniqueConstraint("raw_id", name="uq_factura_compra_raw"),
+        Index("idx_fc_proveedor_id", "proveedor", "id"),
+        Index("idx_fc_fecha", "fecha"),
+    )
 
 class OrdenesCompra(Base):
     __tablename__ = "ordenes_compra"
@@ -88,6 +165,12 @@ class OrdenesCompra(Base):
     monto = Column(DECIMAL(10, 2))
     fecha = Column(Date)
     creado_en = Column(DateTime, default=datetime.utcnow)
+    raw_id = Column(Integer)
+    __table_args__ = (
+        UniqueConstraint("raw_id", name="uq_orden_compra_raw"),
+        Index("idx_oc_proveedor_id", "proveedor", "id"),
+        Index("idx_oc_fecha", "fecha"),
+    )
 
 class PagoRecibido(Base):
     __tablename__ = "pagos_recibidos"
@@ -98,6 +181,10 @@ class PagoRecibido(Base):
     creado_en = Column(DateTime, default=datetime.utcnow)
     raw_id = Column(Integer)
     factura_venta = relationship("FacturaVenta")
+    __table_args__ = (
+        UniqueConstraint("raw_id", name="uq_pago_recibido_raw"),
+        Index("idx_pr_fecha", "fecha"),
+    )
 
 class PagoProveedor(Base):
     __tablename__ = "pagos_proveedor"
@@ -110,12 +197,18 @@ class PagoProveedor(Base):
     raw_id = Column(Integer)
     factura_compra = relationship("FacturaCompra")
     orden_compra = relationship("OrdenesCompra")
+    __table_args__ = (
+        UniqueConstraint("raw_id", name="uq_pago_proveedor_raw"),
+        Index("idx_pp_fecha", "fecha"),
+    )
 
 # Nuevas tablas: Clientes, Productos, FacturaItem
 class Cliente(Base):
     __tablename__ = "clientes"
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(150), nullable=False)
+    # Nombre normalizado para buscar maestros por lote desde el ETL
+    nombre_norm = Column(String(150), Computed("LOWER(TRIM(nombre))", persisted=True), index=True)
     identificacion = Column(String(50), unique=True)
     correo = Column(String(150))
     telefono = Column(String(50))
@@ -126,6 +219,8 @@ class Proveedor(Base):
     __tablename__ = "proveedores"
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(150), nullable=False)
+    # Nombre normalizado para buscar maestros por lote desde el ETL
+    nombre_norm = Column(String(150), Computed("LOWER(TRIM(nombre))", persisted=True), index=True)
     identificacion = Column(String(50), unique=True)
     correo = Column(String(150))
     telefono = Column(String(50))
@@ -138,6 +233,8 @@ class Producto(Base):
     __tablename__ = "productos"
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(150), nullable=False)
+    # Nombre normalizado para buscar maestros por lote desde el ETL
+    nombre_norm = Column(String(150), Computed("LOWER(TRIM(nombre))", persisted=True), index=True)
     sku = Column(String(50), unique=True)
     precio_unitario = Column(DECIMAL(10,2), nullable=False)
     descripcion = Column(Text)
@@ -154,4 +251,5 @@ class FacturaItem(Base):
     precio = Column(DECIMAL(10,2), nullable=False)
     subtotal = Column(DECIMAL(12,2), Computed("cantidad * precio"), nullable=False)
     producto = relationship("Producto")
+    __table_args__ = (Index("idx_items_tipo_id", "factura_tipo", "id"),)
 
@@ -10,7 +10,7 @@ from etl_pipeline import run_etl
 @task(retries=2, retry_delay_seconds=30)
 def etl_task():
     logger = get_run_logger()
-    result = run_etl()
+    result = run_etl(incremental=True)
     logger.info(f"ETL OK: {result}")
     return result
 
@@ -0,0 +1,89 @@
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import etl_pipeline
+
+# Cuántos trabajos terminados se conservan para consultar su estado
+MAX_TRABAJOS = 200
+
+# Un solo hilo: nunca corren dos ETL a la vez en este proceso
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="etl-job")
+_lock = threading.Lock()
+_trabajos = OrderedDict()
+# Trabajo aún en cola por modo (incremental True/False); las nuevas
+# solicitudes del mismo modo se unen a él en lugar de encolar otra corrida
+_pendientes = {}
+
+
+def _ahora():
+    return datetime.utcnow().isoformat()
+
+
+def _ejecutar(trabajo):
+    with _lock:
+        _pendientes.pop(trabajo["incremental"], None)
+        trabajo["estado"] = "en_curso"
+        trabajo["iniciado_en"] = _ahora()
+
+    def progreso(avance):
+        with _lock:
+            trabajo["progreso"] = avance
+
+    try:
+        resultado = etl_pipeline.run_etl(incremental=trabajo["incremental"], progreso=progreso)
+    except Exception as e:
+        with _lock:
+            trabajo["estado"] = "error"
+            trabajo["error"] = f"{type(e).__name__}: {e}"
+            trabajo["terminado_en"] = _ahora()
+        return
+    with _lock:
+        trabajo["estado"] = "completado"
+        trabajo["resultado"] = resultado
+        trabajo["terminado_en"] = _ahora()
+
+
+def encolar(incremental=True):
+    """Encola una corrida del ETL y devuelve (trabajo, coalescido).
+
+    Si ya hay una corrida del mismo modo esperando turno se devuelve esa:
+    todavía no leyó raw_data, así que también procesará lo de esta
+    solicitud. Una corrida en curso sí puede haber leído ya, por eso en
+    ese caso se encola (a lo sumo) una más detrás.
+    """
+    with _lock:
+        pendiente = _pendientes.get(incremental)
+        if pendiente is not None:
+            pendiente["solicitudes"] += 1
+            return dict(pendiente), True
+        trabajo = {
+            "id": uuid.uuid4().hex,
+            "estado": "en_cola",
+            "incremental": incremental,
+            "solicitudes": 1,
+            "creado_en": _ahora(),
+            "iniciado_en": None,
+            "terminado_en": None,
+            "progreso": None,
+            "resultado": None,
+            "error": None,
+        }
+        _trabajos[trabajo["id"]] = trabajo
+        _pendientes[incremental] = trabajo
+        while len(_trabajos) > MAX_TRABAJOS:
+            _, viejo = next(iter(_trabajos.items()))
+            if viejo["estado"] in ("en_cola", "en_curso"):
+                break
+            _trabajos.popitem(last=False)
+        _executor.submit(_ejecutar, trabajo)
+        return dict(trabajo), False
+
+
+def obtener(trabajo_id):
+    """Copia del estado de un trabajo, o None si no existe (o ya se descartó)."""
+    with _lock:
+        trabajo = _trabajos.get(trabajo_id)
+        return dict(trabajo) if trabajo else None
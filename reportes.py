@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+from sqlalchemy import case, extract, func, select
+
+import models
+
+# Nombre en la URL -> modelo con (fecha, monto)
+FACTURAS = {
+    "venta": models.FacturaVenta,
+    "compra": models.FacturaCompra,
+}
+
+
+def _primer_mes(hoy, meses):
+    """Primer día del mes que queda `meses - 1` meses antes del de `hoy`."""
+    indice = hoy.year * 12 + hoy.month - 1 - (meses - 1)
+    return date(indice // 12, indice % 12 + 1, 1)
+
+
+def resumen_mensual(db, tipo, meses=12, hoy=None):
+    """KPIs y serie mensual de facturas de `tipo` calculados en la base.
+
+    Devuelve el total del mes en curso, el de los últimos 30 días, el monto
+    promedio por factura y el total por mes de los últimos `meses` meses
+    (incluidos los meses sin facturas, en 0). Solo viajan los agregados: el
+    costo para el cliente no depende de cuántas facturas tenga la tabla.
+    """
+    modelo = FACTURAS[tipo]
+    hoy = hoy or date.today()
+    inicio_mes = hoy.replace(day=1)
+    inicio_30d = hoy - timedelta(days=30)
+    desde = _primer_mes(hoy, meses)
+
+    anio, mes = extract("year", modelo.fecha), extract("month", modelo.fecha)
+    por_mes = {
+        (int(a), int(m)): (total, cantidad)
+        for a, m, total, cantidad in db.execute(
+            select(anio, mes, func.sum(modelo.monto), func.count())
+            .where(modelo.fecha >= desde)
+            .group_by(anio, mes)
+        )
+    }
+    total_mes, total_30d, promedio, cantidad = db.execute(
+        select(
+            func.sum(case((modelo.fecha >= inicio_mes, modelo.monto), else_=0)),
+            func.sum(case((modelo.fecha >= inicio_30d, modelo.monto), else_=0)),
+            func.avg(modelo.monto),
+            func.count(),
+        )
+    ).one()
+
+    serie = []
+    for i in range(meses):
+        indice = desde.year * 12 + desde.month - 1 + i
+        clave = (indice // 12, indice % 12 + 1)
+        total, n = por_mes.get(clave, (0, 0))
+        serie.append({"mes": "%04d-%02d" % clave, "total": float(total or 0), "cantidad": n})
+    return {
+        "tipo": tipo,
+        "total_mes": float(total_mes or 0),
+        "total_30d": float(total_30d or 0),
+        "promedio": float(promedio or 0),
+        "cantidad": cantidad,
+        "meses": serie,
+    }
@@ -0,0 +1,248 @@
+import csv
+import gzip
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo el lock entre hilos
+    fcntl = None
+
+# Directorio y manifiesto de la cadena de respaldos
+BACKUP_DIR = "backups"
+MANIFEST = os.path.join(BACKUP_DIR, "manifest.json")
+
+# "delta": solo filas nuevas/cambiadas, comprimidas y encadenadas en el manifiesto.
+# "csv": comportamiento anterior (CSV plano con todo lo leído en la corrida).
+ETL_BACKUP_MODE = os.getenv("ETL_BACKUP_MODE", "delta")
+# Cada cuántos deltas se toma un snapshot completo de raw_data
+ETL_BACKUP_FULL_EVERY = int(os.getenv("ETL_BACKUP_FULL_EVERY", "50"))
+
+_manifest_lock = threading.Lock()
+
+
+def leer_manifest():
+    if not os.path.exists(MANIFEST):
+        return []
+    with open(MANIFEST, encoding="utf-8") as f:
+        return json.load(f)
+
+
+@contextmanager
+def _bloquear_manifest():
+    """Lock del manifiesto entre hilos y, con fcntl, entre procesos (varios workers de cola)."""
+    with _manifest_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(MANIFEST + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _agregar_al_manifest(entrada):
+    """Agrega `entrada` enlazándola con el respaldo anterior (y, si es delta, con su base)."""
+    with _bloquear_manifest():
+        entradas = leer_manifest()
+        anterior = _ultimo(entradas)
+        entrada["anterior"] = anterior["archivo"] if anterior else None
+        if entrada["tipo"] == "delta":
+            base = _ultimo(entradas, "completo")
+            entrada["base"] = base["archivo"] if base else None
+        entradas.append(entrada)
+        tmp = MANIFEST + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(entradas, f, indent=2)
+        os.replace(tmp, MANIFEST)
+
+
+def _ultimo(entradas, tipo=None):
+    for entrada in reversed(entradas):
+        if tipo is None or entrada["tipo"] == tipo:
+            return entrada
+    return None
+
+
+def toca_snapshot_completo():
+    """True si no hay base completa o ya se acumularon ETL_BACKUP_FULL_EVERY deltas."""
+    entradas = leer_manifest()
+    base = _ultimo(entradas, "completo")
+    if base is None:
+        return True
+    deltas = sum(1 for e in entradas[entradas.index(base) + 1:] if e["tipo"] == "delta")
+    return deltas >= ETL_BACKUP_FULL_EVERY
+
+
+def _abrir(ruta):
+    if ruta.endswith(".gz"):
+        return gzip.open(ruta, "wt", newline="", encoding="utf-8")
+    return open(ruta, "w", newline="", encoding="utf-8")
+
+
+class Respaldo:
+    """Escritor de respaldos de una corrida del ETL.
+
+    En modo delta escribe `raw_delta_<ts>.csv.gz` con las filas nuevas o
+    cambiadas y `cleaned_<ts>.csv.gz`; al cerrar registra el delta en el
+    manifiesto apuntando a su snapshot base y al respaldo anterior. Los
+    archivos solo se crean si hay filas que respaldar.
+    """
+
+    def __init__(self, timestamp, modo=None, sufijo=""):
+        self.timestamp = timestamp
+        self.modo = modo or ETL_BACKUP_MODE
+        ext = ".csv.gz" if self.modo == "delta" else ".csv"
+        prefijo_raw = "raw_delta" if self.modo == "delta" else "raw"
+        # `sufijo` distingue archivos de procesos que abren un respaldo en el mismo segundo
+        self.raw_file = os.path.join(BACKUP_DIR, f"{prefijo_raw}_{timestamp}{sufijo}{ext}")
+        self.clean_file = os.path.join(BACKUP_DIR, f"cleaned_{timestamp}{sufijo}{ext}")
+        self._raw_f = self._raw_writer = None
+        self._clean_f = self._clean_writer = None
+        self.filas_raw = 0
+        self.filas_cleaned = 0
+        self.max_raw_id = None
+
+    def escribir_raw(self, columns, rows):
+        if not rows:
+            return
+        if self._raw_writer is None:
+            self._raw_f = _abrir(self.raw_file)
+            self._raw_writer = csv.writer(self._raw_f)
+            self._raw_writer.writerow(columns)
+        self._raw_writer.writerows(rows)
+        self.filas_raw += len(rows)
+        id_idx = list(columns).index("id")
+        ultimo = max(r[id_idx] for r in rows)
+        self.max_raw_id = ultimo if self.max_raw_id is None else max(self.max_raw_id, ultimo)
+
+    def escribir_cleaned(self, cleaned):
+        if not cleaned:
+            return
+        if self._clean_writer is None:
+            self._clean_f = _abrir(self.clean_file)
+            self._clean_writer = csv.DictWriter(self._clean_f, fieldnames=cleaned[0].keys())
+            self._clean_writer.writeheader()
+        self._clean_writer.writerows(cleaned)
+        self.filas_cleaned += len(cleaned)
+
+    def cerrar(self, registrar=True):
+        """Cierra los archivos y (en modo delta) encadena la corrida en el manifiesto."""
+        for f in (self._raw_f, self._clean_f):
+            if f:
+                f.close()
+        raw_file = self.raw_file if self._raw_writer else None
+        clean_file = self.clean_file if self._clean_writer else None
+        if registrar and self.modo == "delta" and raw_file:
+            _agregar_al_manifest({
+                "tipo": "delta",
+                "archivo": raw_file,
+                "cleaned": clean_file,
+                "timestamp": self.timestamp,
+                "filas": self.filas_raw,
+                "max_raw_id": self.max_raw_id,
+            })
+        return raw_file, clean_file
+
+
+class VentanaRespaldo:
+    """Un delta de respaldo compartido por varias corridas cortas durante `segundos`.
+
+    Los micro-lotes de etl_worker escriben en el Respaldo de la ventana en
+    curso; al vencer se cierra y queda como un solo delta en el manifiesto,
+    en lugar de un archivo y una reescritura del manifiesto por lote.
+    """
+
+    def __init__(self, segundos, reloj=time.monotonic):
+        self.segundos = segundos
+        self._reloj = reloj
+        self._respaldo = None
+        self._abierto_en = None
+
+    def actual(self):
+        """Respaldo de la ventana en curso (lo abre si no hay uno)."""
+        if self._respaldo is None:
+            self._respaldo = Respaldo(datetime.now().strftime("%Y%m%d_%H%M%S"), sufijo=f"_{os.getpid()}")
+            self._abierto_en = self._reloj()
+        return self._respaldo
+
+    def rotar(self, forzar=False):
+        """Cierra y encadena el delta si la ventana venció (o si `forzar`); devuelve sus archivos."""
+        if self._respaldo is None or not (forzar or self._reloj() - self._abierto_en >= self.segundos):
+            return None, None
+        archivos = self._respaldo.cerrar()
+        self._respaldo = None
+        return archivos
+
+
+def snapshot_completo(engine, timestamp=None, chunk_size=5000):
+    """Vuelca raw_data completa (cursor del lado del servidor) a `raw_full_<ts>.csv.gz`."""
+    from sqlalchemy import text
+
+    timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+    ruta = os.path.join(BACKUP_DIR, f"raw_full_{timestamp}.csv.gz")
+    filas = 0
+    max_raw_id = None
+    with engine.connect() as lectura, _abrir(ruta) as f:
+        result = lectura.execution_options(stream_results=True, max_row_buffer=chunk_size).execute(
+            text("SELECT * FROM raw_data ORDER BY id")
+        )
+        columns = list(result.keys())
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for rows in result.partitions(chunk_size):
+            writer.writerows(rows)
+            filas += len(rows)
+            max_raw_id = rows[-1][columns.index("id")]
+    _agregar_al_manifest({
+        "tipo": "completo",
+        "archivo": ruta,
+        "cleaned": None,
+        "base": None,
+        "timestamp": timestamp,
+        "filas": filas,
+        "max_raw_id": max_raw_id,
+    })
+    return ruta
+
+
+def restaurar(destino, hasta=None):
+    """Reconstruye raw_data en `destino` (CSV) desde el último snapshot completo
+    más sus deltas, hasta el timestamp `hasta` inclusive (o hasta el final).
+    Las filas de un delta reemplazan a las de igual id del snapshot."""
+    entradas = [e for e in leer_manifest() if hasta is None or e["timestamp"] <= hasta]
+    base = _ultimo(entradas, "completo")
+    if base is None:
+        raise ValueError("No hay snapshot completo en el manifiesto")
+    cadena = [base] + [e for e in entradas[entradas.index(base) + 1:] if e["tipo"] == "delta"]
+
+    filas = {}
+    columns = None
+    for entrada in cadena:
+        with gzip.open(entrada["archivo"], "rt", newline="", encoding="utf-8") as f:
+            reader = csv.reader(f)
+            columns = next(reader)
+            id_idx = columns.index("id")
+            for row in reader:
+                filas[int(row[id_idx])] = row
+    with open(destino, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for raw_id in sorted(filas):
+            writer.writerow(filas[raw_id])
+    return len(filas)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Reconstruir raw_data desde snapshot + deltas")
+    parser.add_argument("destino", help="CSV de salida")
+    parser.add_argument("--hasta", default=None, help="timestamp (YYYYmmdd_HHMMSS) del último delta a aplicar")
+    args = parser.parse_args()
+    print(f"{restaurar(args.destino, args.hasta)} filas restauradas en {args.destino}")
@@ -5,6 +5,7 @@ import logging
 from datetime import datetime, timedelta
 from etl_pipeline import run_etl
 from database import SessionLocal
+import idempotencia
 import models
 from decimal import Decimal
 
@@ -74,7 +75,7 @@ def ejecutar_pipeline_seguro():
         logging.info("Generando facturas recurrentes si toca...")
         generar_facturas_recurrentes()
         logging.info("Ejecutando ETL...")
-        resumen = run_etl()
+        resumen = run_etl(incremental=True)
         logging.info(f"ETL completado: limpios={resumen.get('registros_limpios')}")
     except Exception as e:
         logging.exception(f"Error en scheduler: {e}")
@@ -82,8 +83,20 @@ def ejecutar_pipeline_seguro():
         with _lock:
             _running = False
 
+def purgar_idempotencia():
+    db = SessionLocal()
+    try:
+        borradas = idempotencia.purgar_vencidas(db)
+        logging.info(f"Idempotency-Keys vencidas borradas: {borradas}")
+    except Exception:
+        logging.exception("Error purgando idempotency_keys")
+    finally:
+        db.close()
+
 # Programar cada 10 minutos
 schedule.every(10).minutes.do(ejecutar_pipeline_seguro)
+# Claves de idempotencia vencidas, una vez por hora
+schedule.every().hour.do(purgar_idempotencia)
 
 logging.info("Scheduler iniciado. Pipeline y recurrentes cada 10 minutos.")
 
@@ -0,0 +1,138 @@
+from datetime import date
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, field_validator, model_validator
+
+# Modelos de entrada de la API (cuerpos de POST/PUT). Viven aparte de main.py
+# para usarlos sin levantar la app ni conectarse a la base (ingesta, pruebas).
+
+
+class RawEntryIn(BaseModel):
+    tipo: str
+    descripcion: str
+    monto: float
+    fecha: date
+
+    @field_validator("tipo")
+    def tipo_valido(cls, v):
+        if v.lower() not in (
+            "ingreso",
+            "gasto",
+            "factura_recurrente",
+            "pago_recibido",
+            "pago_proveedor",
+            "orden_compra",
+        ):
+            raise ValueError("tipo inválido")
+        return v.lower()
+
+
+class FacturaVentaIn(BaseModel):
+    cliente: str
+    descripcion: str
+    monto: float
+    fecha: date
+    raw_id: Optional[int] = None
+
+
+class FacturaCompraIn(BaseModel):
+    proveedor: str
+    descripcion: str
+    monto: float
+    fecha: date
+    raw_id: Optional[int] = None
+
+
+class RecurringTemplateIn(BaseModel):
+    cliente: str
+    descripcion: str
+    monto: float
+    frecuencia: str
+
+
+class PagoRecibidoIn(BaseModel):
+    factura_venta_id: int
+    monto: float
+    fecha: date
+
+    @model_validator(mode="after")
+    def verifica_factura(cls, v):
+        # Puede agregar validación adicional aquí
+        return v
+
+
+class PagoProveedorIn(BaseModel):
+    factura_compra_id: Optional[int] = None
+    orden_compra_id: Optional[int] = None
+    monto: float
+    fecha: date
+
+    @model_validator(mode="after")
+    def al_menos_uno(cls, v):
+        if not v.factura_compra_id and not v.orden_compra_id:
+            raise ValueError("Se requiere factura_compra_id o orden_compra_id")
+        return v
+
+
+class ClienteIn(BaseModel):
+    nombre: str
+    identificacion: Optional[str] = None
+    correo: Optional[str] = None
+    telefono: Optional[str] = None
+    direccion: Optional[str] = None
+
+
+class ProveedorIn(BaseModel):
+    nombre: str
+    identificacion: Optional[str] = None
+    correo: Optional[str] = None
+    telefono: Optional[str] = None
+    direccion: Optional[str] = None
+    contacto_nombre: Optional[str] = None
+    contacto_telefono: Optional[str] = None
+
+
+class ProductoIn(BaseModel):
+    nombre: str
+    sku: Optional[str] = None
+    precio_unitario: float
+    descripcion: Optional[str] = None
+
+
+class FacturaItemIn(BaseModel):
+    factura_tipo: Literal['venta', 'compra']
+    factura_venta_id: Optional[int] = None
+    factura_compra_id: Optional[int] = None
+    producto_id: int
+    cantidad: int
+    precio: float
+
+
+class FacturaLineaIn(BaseModel):
+    producto_id: int
+    cantidad: int
+    precio: float
+
+
+class FacturaVentaCreateIn(BaseModel):
+    cliente: str
+    descripcion: str
+    fecha: date
+    items: List[FacturaLineaIn]  # requerido para múltiples productos
+
+
+class FacturaCompraCreateIn(BaseModel):
+    proveedor: str
+    descripcion: str
+    fecha: date
+    items: List[FacturaLineaIn]
+
+
+class PipelineRegistrosIn(BaseModel):
+    raw_ids: List[int]
+
+    @field_validator("raw_ids")
+    def cantidad_valida(cls, v):
+        if not v or len(v) > 1000:
+            raise ValueError("raw_ids debe tener entre 1 y 1000 elementos")
+        return v
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from operator import attrgetter
+
+import orjson
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+import models
+
+
+class RespuestaJSON(JSONResponse):
+    """JSONResponse con orjson: los endpoints que la devuelven ya traen tipos
+    JSON (ver Serializador), así que FastAPI no pasa por jsonable_encoder."""
+
+    def render(self, content):
+        return orjson.dumps(content)
+
+
+def _a_float(val):
+    return None if val is None else float(val)
+
+
+def _a_iso(val):
+    return None if val is None else val.isoformat()
+
+
+def _conversor(columna):
+    """Conversión de una columna al formato de la API, decidida por su tipo una sola vez."""
+    try:
+        tipo = columna.type.python_type
+    except NotImplementedError:
+        return None
+    if issubclass(tipo, Decimal):
+        return _a_float
+    if hasattr(tipo, "isoformat"):
+        return _a_iso
+    return None
+
+
+class Serializador:
+    """Convierte filas de un modelo (tuplas de columnas u objetos ORM) a dicts de la API.
+
+    Nombres y conversores se arman al crearlo; por fila solo queda un zip y
+    las conversiones de Decimal y fechas en las columnas que las necesitan.
+    """
+
+    def __init__(self, modelo, nombres=None):
+        tabla = modelo.__table__
+        nombres = nombres or [c.name for c in tabla.columns]
+        self.modelo = modelo
+        self.nombres = tuple(nombres)
+        self.columnas = [getattr(modelo, n) for n in self.nombres]
+        self._conversiones = [
+            (i, conv) for i, conv in enumerate(_conversor(tabla.c[n]) for n in self.nombres) if conv
+        ]
+        self._leer = attrgetter(*self.nombres)
+
+    def fila(self, fila):
+        """dict a partir de una tupla con los valores en el orden de `nombres`."""
+        if self._conversiones:
+            fila = list(fila)
+            for i, conv in self._conversiones:
+                fila[i] = conv(fila[i])
+        return dict(zip(self.nombres, fila))
+
+    def objeto(self, obj):
+        valores = self._leer(obj)
+        return self.fila(valores if len(self.nombres) > 1 else (valores,))
+
+    __call__ = fila
+
+
+# Uno por modelo, armados al importar el módulo
+_SERIALIZADORES = {
+    mapper.class_: Serializador(mapper.class_) for mapper in models.Base.registry.mappers
+}
+
+
+def de(modelo):
+    return _SERIALIZADORES[modelo]
+
+
+def proyectar(modelo, fields=None):
+    """Serializador de las columnas pedidas en `fields` ("id,monto,fecha").
+
+    La clave primaria va siempre (la paginación la usa como cursor). Un
+    nombre que no es columna del modelo es un error del cliente.
+    """
+    completo = de(modelo)
+    if not fields:
+        return completo
+    pedidos = [f.strip() for f in fields.split(",") if f.strip()]
+    desconocidos = [f for f in pedidos if f not in completo.nombres]
+    if desconocidos:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Campos desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(completo.nombres)}",
+        )
+    claves = [c.name for c in modelo.__table__.primary_key]
+    nombres = [n for n in completo.nombres if n in claves or n in pedidos]
+    return Serializador(modelo, nombres)
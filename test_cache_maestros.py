@@ -0,0 +1,81 @@
+"""
+Pruebas del cache de maestros del ETL (SQLite en memoria, sin MySQL)
+"""
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import cache_maestros
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        for tabla in ("clientes", "proveedores"):
+            conn.execute(text(f"CREATE TABLE {tabla} (id INTEGER PRIMARY KEY, nombre_norm TEXT)"))
+        conn.execute(text("CREATE TABLE productos (id INTEGER PRIMARY KEY, nombre_norm TEXT, sku TEXT)"))
+        conn.execute(text("INSERT INTO clientes (nombre_norm) VALUES ('acme'), ('beta'), ('gamma')"))
+        yield conn
+
+
+def _contar_consultas(conn):
+    consultas = []
+    conn.connection.dbapi_connection.set_trace_callback(consultas.append)
+    return consultas
+
+
+def test_precarga_resuelve_sin_consultar(conn):
+    """Lo precargado se resuelve desde el diccionario, sin ir a la base"""
+    cache = cache_maestros.CacheMaestros()
+    cache.precargar(conn)
+    consultas = _contar_consultas(conn)
+    assert cache.resolver(conn, "clientes", "nombre_norm", ["acme", "gamma"]) == {"acme": 1, "gamma": 3}
+    assert consultas == []
+
+
+def test_limite_desaloja_lo_menos_usado_y_lo_recupera_por_lote(conn):
+    """Con un límite de 2 entradas, la más antigua sale del cache y se vuelve a consultar"""
+    cache = cache_maestros.CacheMaestros(max_entradas=2)
+    cache.precargar(conn)
+    assert cache.resumen()["entradas"]["clientes.nombre_norm"] == 2
+    consultas = _contar_consultas(conn)
+    assert cache.resolver(conn, "clientes", "nombre_norm", ["acme", "beta", "zeta"]) == {"acme": 1, "beta": 2}
+    assert len(consultas) == 1
+    assert cache.resumen()["entradas"]["clientes.nombre_norm"] == 2
+
+
+def test_registrar_altas_de_la_corrida(conn):
+    """Lo registrado durante la corrida se resuelve sin consultar; los ausentes no se cachean"""
+    cache = cache_maestros.CacheMaestros()
+    cache.registrar("productos", "sku", [("T-1", 10)])
+    consultas = _contar_consultas(conn)
+    assert cache.resolver(conn, "productos", "sku", ["T-1"]) == {"T-1": 10}
+    assert consultas == []
+    assert cache.resolver(conn, "productos", "sku", ["T-2"]) == {}
+    assert cache.resolver(conn, "productos", "sku", ["T-2"]) == {}
+    assert len(consultas) == 2
+
+
+def test_claves_segun_la_colacion(conn):
+    """Mayúsculas, acentos y espacios finales no distinguen claves, como en utf8mb4_unicode_ci"""
+    cache = cache_maestros.CacheMaestros()
+    cache.registrar("clientes", "nombre_norm", [("josé pérez", 7)])
+    consultas = _contar_consultas(conn)
+    assert cache.resolver(conn, "clientes", "nombre_norm", ["JOSE PEREZ ", "josé pérez"]) == {
+        "JOSE PEREZ ": 7, "josé pérez": 7,
+    }
+    assert consultas == []
+
+
+def test_resultado_por_clave_pedida(conn):
+    """Lo que vuelve de la base con otra capitalización se asigna a la clave que se pidió"""
+    # NOCASE de SQLite hace de colación sin distinción de mayúsculas
+    conn.execute(text("DROP TABLE productos"))
+    conn.execute(text("CREATE TABLE productos (id INTEGER PRIMARY KEY, nombre_norm TEXT, sku TEXT COLLATE NOCASE)"))
+    conn.execute(text("INSERT INTO productos (id, sku) VALUES (5, 'AB-100')"))
+    cache = cache_maestros.CacheMaestros()
+    assert cache.resolver(conn, "productos", "sku", ["ab-100", "zz-1"]) == {"ab-100": 5}
+    consultas = _contar_consultas(conn)
+    assert cache.resolver(conn, "productos", "sku", ["Ab-100"]) == {"Ab-100": 5}
+    assert consultas == []
@@ -0,0 +1,53 @@
+"""
+Pruebas de la capa asíncrona contra SQLite (aiosqlite) en lugar de MySQL
+"""
+
+import asyncio
+import importlib
+
+import pytest
+
+pytest.importorskip("aiosqlite")
+pytest.importorskip("greenlet")
+
+from sqlalchemy import select
+
+import ingesta
+import models
+from schemas import RawEntryIn
+
+
+@pytest.fixture
+def database_async(monkeypatch, tmp_path):
+    monkeypatch.setenv("ASYNC_DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'prueba.db'}")
+    import database_async
+    modulo = importlib.reload(database_async)
+
+    async def crear():
+        async with modulo.async_engine.begin() as conn:
+            await conn.run_sync(models.RawData.__table__.create)
+
+    asyncio.run(crear())
+    yield modulo
+    asyncio.run(modulo.async_engine.dispose())
+
+
+def test_ingesta_masiva_y_lectura_por_la_sesion_asincrona(database_async):
+    filas = [
+        {"tipo": "ingreso", "descripcion": f"Acme - Venta {i}", "monto": i, "fecha": "2025-01-01"}
+        for i in range(5)
+    ]
+
+    async def correr():
+        async for db in database_async.get_async_db():
+            validas, resultados = ingesta.validar(filas, RawEntryIn)
+            resumen = await db.run_sync(ingesta.insertar, validas, resultados, 2)
+            leidas = (await db.execute(
+                select(models.RawData.id, models.RawData.descripcion).order_by(models.RawData.id.desc()).limit(2)
+            )).all()
+            return resumen, leidas
+
+    resumen, leidas = asyncio.run(correr())
+    assert resumen["insertadas"] == 5
+    assert [r["raw_id"] for r in resumen["resultados"]] == [1, 2, 3, 4, 5]
+    assert [tuple(f) for f in leidas] == [(5, "Acme - Venta 4"), (4, "Acme - Venta 3")]
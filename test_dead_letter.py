@@ -0,0 +1,227 @@
+"""
+Pruebas de las filas rechazadas hacia etl_dead_letter (SQLite en memoria, sin MySQL)
+"""
+
+from datetime import date
+
+import pytest
+from sqlalchemy import bindparam, create_engine, event, text
+from sqlalchemy.exc import IntegrityError
+
+import etl_pipeline
+import models
+import respaldos
+
+
+@pytest.fixture
+def conn():
+    engine = create_engine("sqlite://")
+
+    @event.listens_for(engine, "connect")
+    def _fk(dbapi_conn, _):
+        dbapi_conn.execute("PRAGMA foreign_keys = ON")
+
+    # Mismo esquema que producción (models.py), con sus claves únicas sobre raw_id
+    models.Base.metadata.create_all(engine, tables=[
+        models.RawData.__table__, models.FacturaVenta.__table__, models.FacturaCompra.__table__,
+        models.OrdenesCompra.__table__, models.PagoRecibido.__table__, models.PagoProveedor.__table__,
+    ])
+    with engine.begin() as conn:
+        for tabla in ("facturas_venta", "facturas_compra", "ordenes_compra"):
+            conn.execute(text(f"INSERT INTO {tabla} (id) VALUES (1), (2)"))
+        yield conn
+
+
+def _pago(raw_id, descripcion):
+    return {"id": raw_id, "descripcion": descripcion, "monto": 10.0, "fecha": date(2025, 1, 1)}
+
+
+def test_pago_a_factura_inexistente_se_aparca(conn):
+    """Solo el pago con referencia rota queda rechazado; el resto del lote se inserta"""
+    items = [_pago(10, "1-Pago factura 1"), _pago(11, "99-Pago factura inexistente"), _pago(12, "2-Pago")]
+    rechazados = etl_pipeline._cargar_pagos_recibidos(conn, items, batch_size=10)
+    assert [r["rid"] for r in rechazados] == [11]
+    assert rechazados[0]["etapa"] == "carga_pagos_recibidos"
+    assert "facturas_venta.id = 99" in rechazados[0]["error"]
+    cargados = conn.execute(text("SELECT raw_id, factura_venta_id FROM pagos_recibidos ORDER BY raw_id")).fetchall()
+    assert cargados == [(10, 1), (12, 2)]
+
+
+
+def test_pago_repetido_no_se_duplica(conn):
+    """Un pago ya cargado no se vuelve a insertar, y la clave única de raw_id frena una segunda copia"""
+    etl_pipeline._cargar_pagos_recibidos(conn, [_pago(10, "1-Pago")], batch_size=10)
+    etl_pipeline._cargar_pagos_recibidos(conn, [_pago(10, "1-Pago")], batch_size=10)
+    assert conn.execute(text("SELECT COUNT(*) FROM pagos_recibidos WHERE raw_id = 10")).scalar() == 1
+    with pytest.raises(IntegrityError):
+        conn.execute(text(
+            "INSERT INTO pagos_recibidos (factura_venta_id, monto, fecha, raw_id) VALUES (1, 5, '2025-01-01', 10)"
+        ))
+
+def test_pago_actualizado_a_referencia_inexistente_no_se_pisa(conn):
+    """Una edición que apunta a una factura inexistente se aparca y el pago cargado queda como estaba"""
+    conn.execute(text(
+        "INSERT INTO pagos_recibidos (factura_venta_id, monto, fecha, raw_id) VALUES (1, 5, '2025-01-01', 10)"
+    ))
+    rechazados = etl_pipeline._cargar_pagos_recibidos(conn, [_pago(10, "77-Corregido")], 10, cambiados={10})
+    assert [r["rid"] for r in rechazados] == [10]
+    assert conn.execute(text("SELECT factura_venta_id FROM pagos_recibidos WHERE raw_id = 10")).scalar() == 1
+
+
+def test_pago_proveedor_verifica_facturas_y_ordenes(conn):
+    items = [_pago(20, "FC-1 - Pago"), _pago(21, "OC-2 - Anticipo"),
+             _pago(22, "OC-5 - Anticipo"), _pago(23, "FC-8 - Pago")]
+    rechazados = etl_pipeline._cargar_pagos_proveedor(conn, items, batch_size=10)
+    assert sorted(r["rid"] for r in rechazados) == [22, 23]
+    cargados = conn.execute(text(
+        "SELECT raw_id, factura_compra_id, orden_compra_id FROM pagos_proveedor ORDER BY raw_id"
+    )).fetchall()
+    assert cargados == [(20, 1, None), (21, None, 2)]
+
+
+class ConexionRegistro:
+    """Conexión falsa que solo registra las sentencias y sus parámetros."""
+
+    def __init__(self):
+        self.sentencias = []
+
+    def execute(self, sql, params=None):
+        self.sentencias.append((" ".join(str(sql).split()), params))
+
+
+def test_rechazo_describe_la_excepcion():
+    rechazo = etl_pipeline._rechazo(5, "limpieza", ValueError("faltan campos: monto"))
+    assert rechazo == {"rid": 5, "etapa": "limpieza", "error": "ValueError: faltan campos: monto", "estado": "aparcada"}
+
+
+def test_referencia_faltante_queda_en_espera():
+    """Un producto, factura u orden que aún no existe no aparca la fila: queda en espera de reintento"""
+    rechazo = etl_pipeline._rechazo(5, "carga_pagos_recibidos", etl_pipeline.ReferenciaFaltante("referencia"))
+    assert rechazo["estado"] == "espera"
+
+
+def test_rechazo_trunca_el_error():
+    rechazo = etl_pipeline._rechazo(5, "limpieza", ValueError("x" * 5000))
+    assert len(rechazo["error"]) == 2000
+    assert rechazo["error"].startswith("ValueError: xxx")
+
+
+def test_transformar_junta_los_fallos_sin_cortar_el_lote():
+    """Cada item que falla queda en rechazados con su etapa; el resto se transforma en orden"""
+    items = [{"id": 1, "descripcion": "3-Pago"}, {"id": 2, "descripcion": "sin-numero"},
+             {"id": 3, "descripcion": "4-Pago"}, {"id": 4}]
+    rechazados = []
+    filas = etl_pipeline._transformar(
+        items, lambda item: int(item["descripcion"].split("-", 1)[0]), "carga_pagos_recibidos", rechazados
+    )
+    assert filas == [3, 4]
+    assert [r["rid"] for r in rechazados] == [2, 4]
+    assert {r["etapa"] for r in rechazados} == {"carga_pagos_recibidos"}
+    assert rechazados[0]["error"].startswith("ValueError: invalid literal")
+    assert rechazados[1]["error"] == "KeyError: 'descripcion'"
+
+
+def test_aparcar_registra_y_olvida_el_hash_por_lote():
+    """Un INSERT multi-fila y un DELETE de etl_hashes por lote de rechazados"""
+    conn = ConexionRegistro()
+    rechazados = [etl_pipeline._rechazo(i, "limpieza", ValueError("mal")) for i in (1, 2, 3)]
+    etl_pipeline._aparcar(conn, rechazados, batch_size=2)
+    sentencias = [sql.split(" ")[0] + " " + sql.split(" ")[2] for sql, _ in conn.sentencias]
+    assert sentencias == ["INSERT etl_dead_letter", "DELETE etl_hashes", "INSERT etl_dead_letter", "DELETE etl_hashes"]
+    assert conn.sentencias[0][1] == rechazados[:2]
+    assert conn.sentencias[1][1] == {"ids": [1, 2]}
+    assert conn.sentencias[3][1] == {"ids": [3]}
+
+
+def test_liberar_dead_letter_sin_filas_no_consulta():
+    conn = ConexionRegistro()
+    etl_pipeline._liberar_dead_letter(conn, [])
+    assert conn.sentencias == []
+
+
+@pytest.fixture
+def corrida(tmp_path, monkeypatch):
+    """run_etl real sobre SQLite; solo se reemplazan las sentencias propias de MySQL (ON DUPLICATE KEY, NOW())."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'etl.db'}")
+    models.Base.metadata.create_all(engine, tables=[
+        models.RawData.__table__, models.EtlHash.__table__, models.EtlDeadLetter.__table__,
+        models.FacturaVenta.__table__, models.PagoRecibido.__table__,
+    ])
+    monkeypatch.setattr(etl_pipeline, "engine", engine)
+    monkeypatch.setattr(respaldos, "BACKUP_DIR", str(tmp_path))
+    monkeypatch.setattr(respaldos, "MANIFEST", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(etl_pipeline, "_leer_watermark", lambda conn: (0, None))
+    monkeypatch.setattr(etl_pipeline, "_guardar_watermark", lambda conn, rid, cambio: None)
+    monkeypatch.setattr(etl_pipeline, "_checkpoint_pendiente", lambda conn, modo, propietario: None)
+    monkeypatch.setattr(etl_pipeline, "_abrir_checkpoint", lambda conn, modo, propietario: 1)
+    monkeypatch.setattr(etl_pipeline, "_guardar_checkpoint", lambda *args, **kwargs: None)
+
+    def tomar_filas(leidas, propietario):
+        with engine.begin() as conn:
+            conn.execute(
+                text("UPDATE raw_data SET etl_estado = 'en_proceso', etl_lease_owner = :owner WHERE id IN :ids")
+                .bindparams(bindparam("ids", expanding=True)),
+                {"owner": propietario, "ids": list(leidas)},
+            )
+        return set(leidas)
+
+    monkeypatch.setattr(etl_pipeline, "_tomar_filas", tomar_filas)
+    monkeypatch.setattr(etl_pipeline, "_upsert_cleaned", lambda conn, cleaned, batch_size: None)
+    monkeypatch.setattr(etl_pipeline, "_guardar_hashes", lambda conn, hashes, batch_size: None)
+
+    def aparcar(conn, rechazados, batch_size):
+        conn.execute(text("""
+            INSERT INTO etl_dead_letter (raw_id, etapa, error, estado, intentos)
+            VALUES (:rid, :etapa, :error, :estado, 1)
+            ON CONFLICT (raw_id) DO UPDATE SET estado = excluded.estado, intentos = intentos + 1
+        """), rechazados)
+
+    cargar_tabla = etl_pipeline._cargar_tabla
+
+    def cargar_facturas(conn, tabla, items, batch_size, cambiados=frozenset()):
+        if tabla != "facturas_venta":
+            return cargar_tabla(conn, tabla, items, batch_size, cambiados)
+        for item in items:
+            conn.execute(text("INSERT INTO facturas_venta (id, cliente, monto, raw_id) VALUES (:id, 'Acme', 10, :id)"),
+                         {"id": item["id"]})
+        return []
+
+    monkeypatch.setattr(etl_pipeline, "_aparcar", aparcar)
+    monkeypatch.setattr(etl_pipeline, "_cargar_tabla", cargar_facturas)
+    return engine
+
+
+def test_pago_cuya_factura_llega_en_un_chunk_posterior(corrida):
+    """El pago del chunk 1 apunta a la factura del chunk 2: queda en espera y se carga al final de la corrida"""
+    with corrida.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO raw_data (id, tipo, descripcion, monto, fecha, etl_estado)
+            VALUES (1, 'pago_recibido', '2-Abono', 10, '2025-01-02', 'pendiente'),
+                   (2, 'ingreso', 'Acme - Venta', 10, '2025-01-01', 'pendiente')
+        """))
+
+    resumen = etl_pipeline.run_etl(streaming=False, chunk_size=1, workers=1, commit_por_chunk=True,
+                                   respaldo_completo=False, precargar_cache=False, escribir_log=False)
+
+    assert resumen["aparcados"] == 1
+    assert resumen["espera"] == {"reintentadas": 1, "cargadas": 1, "siguen_en_espera": 0}
+    with corrida.connect() as conn:
+        assert conn.execute(text("SELECT raw_id, factura_venta_id FROM pagos_recibidos")).fetchall() == [(1, 2)]
+        assert conn.execute(text("SELECT COUNT(*) FROM etl_dead_letter")).scalar() == 0
+        assert conn.execute(text("SELECT etl_estado FROM raw_data WHERE id = 1")).scalar() == "procesado"
+
+
+def test_referencia_que_no_llega_sigue_en_espera(corrida):
+    with corrida.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO raw_data (id, tipo, descripcion, monto, fecha, etl_estado)
+            VALUES (1, 'pago_recibido', '99-Abono', 10, '2025-01-02', 'pendiente')
+        """))
+
+    resumen = etl_pipeline.run_etl(streaming=False, chunk_size=1, workers=1, commit_por_chunk=True,
+                                   respaldo_completo=False, precargar_cache=False, escribir_log=False)
+
+    # Sin filas cargadas no pudo llegar ninguna referencia: no se reintenta en esta corrida
+    assert resumen["espera"]["reintentadas"] == 0
+    with corrida.connect() as conn:
+        assert conn.execute(text("SELECT estado FROM etl_dead_letter WHERE raw_id = 1")).scalar() == "espera"
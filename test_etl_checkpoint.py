@@ -0,0 +1,159 @@
+"""
+Pruebas de los checkpoints del ETL por chunks: posición guardada y reanudación (sin MySQL)
+"""
+
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+import etl_pipeline
+
+COLUMNAS = ["id", "tipo"]
+
+
+class Corrida:
+    """Reemplaza la base y la extracción de run_etl; registra checkpoints, watermark y extracciones."""
+
+    def __init__(self, monkeypatch, watermark=(0, None), pendiente=None):
+        self.checkpoints = []
+        self.watermarks = []
+        self.extracciones = []
+        self.chunks = []
+        self.falla_tras = None
+        self.pendiente = pendiente
+
+        @contextmanager
+        def begin():
+            yield object()
+
+        monkeypatch.setattr(etl_pipeline, "engine", type("Engine", (), {"begin": staticmethod(begin)}))
+        monkeypatch.setattr(etl_pipeline, "_leer_watermark", lambda conn: watermark)
+        monkeypatch.setattr(etl_pipeline, "_checkpoint_pendiente", lambda conn, modo, propietario: self.pendiente)
+        monkeypatch.setattr(etl_pipeline, "_abrir_checkpoint", lambda conn, modo, propietario: 7)
+        monkeypatch.setattr(etl_pipeline, "_guardar_checkpoint", self._guardar_checkpoint)
+        monkeypatch.setattr(etl_pipeline, "_guardar_watermark",
+                            lambda conn, rid, cambio: self.watermarks.append(rid))
+        monkeypatch.setattr(etl_pipeline, "_extraer_chunks", self._extraer_chunks)
+        monkeypatch.setattr(etl_pipeline, "_procesar_chunk", self._procesar_chunk)
+        monkeypatch.setattr(etl_pipeline, "_soltar_filas", lambda propietario: None)
+
+    def _guardar_checkpoint(self, conn, checkpoint_id, propietario, ultimo_raw_id, ultimo_cambio, filas,
+                            estado="en_curso"):
+        self.checkpoints.append((checkpoint_id, ultimo_raw_id, estado))
+
+    def _extraer_chunks(self, sql, params, streaming, chunk_size):
+        self.extracciones.append(params["desde_id"])
+        for i, ids in enumerate(self.chunks):
+            if i == self.falla_tras:
+                raise RuntimeError("corrida interrumpida")
+            rows = [(rid, "ingreso") for rid in ids if rid > params["desde_id"]]
+            if rows:
+                yield COLUMNAS, rows
+
+    @staticmethod
+    def _procesar_chunk(conn, columns, rows, estado, *args, **kwargs):
+        estado["total_chunks"] += 1
+        estado["nuevo_id"] = max(estado["nuevo_id"], max(row[0] for row in rows))
+
+    def correr(self, incremental=False):
+        return etl_pipeline.run_etl(incremental=incremental, commit_por_chunk=True, respaldo_completo=False,
+                                    precargar_cache=False, escribir_log=False)
+
+
+def test_checkpoint_guarda_lo_leido_y_no_el_watermark(monkeypatch):
+    """Una corrida completa con el watermark en 1000 guarda en el checkpoint hasta dónde leyó"""
+    corrida = Corrida(monkeypatch, watermark=(1000, None))
+    corrida.chunks = [[1, 2], [3, 4], [5, 6]]
+    corrida.falla_tras = 2
+    with pytest.raises(RuntimeError):
+        corrida.correr()
+    assert corrida.checkpoints == [(7, 2, "en_curso"), (7, 4, "en_curso")]
+    assert corrida.watermarks == []
+
+
+def test_reanudar_sigue_desde_el_ultimo_chunk_confirmado(monkeypatch):
+    """Al reanudar se lee desde el checkpoint y el watermark no retrocede"""
+    corrida = Corrida(monkeypatch, watermark=(1000, None), pendiente=(7, 4, None))
+    corrida.chunks = [[1, 2], [3, 4], [5, 6]]
+    resumen = corrida.correr()
+    assert corrida.extracciones == [4]
+    assert resumen["reanudado_desde"] == 4
+    assert resumen["checkpoint_id"] == 7
+    assert corrida.checkpoints[-1] == (7, 6, "completado")
+    assert corrida.watermarks == [1000]
+
+
+class ConexionCheckpoints:
+    """Conexión falsa sobre una lista de checkpoints: responde la búsqueda y los UPDATE de etl_checkpoint."""
+
+    def __init__(self, checkpoints):
+        self.checkpoints = checkpoints
+
+    def execute(self, sql, params):
+        if str(sql).strip().startswith("SELECT"):
+            vencidos = [c for c in self.checkpoints
+                        if c["modo"] == params["modo"] and c["estado"] == "en_curso"
+                        and c["actualizado_en"] < params["limite"]]
+            fila = max(vencidos, key=lambda c: c["id"], default=None)
+            return Resultado((fila["id"], fila["ultimo_raw_id"], None) if fila else None)
+        # Adopción: por id. Avance (_guardar_checkpoint): por id y propietario
+        avance = "rid" in params
+        tocados = [c for c in self.checkpoints
+                   if c["id"] == params["id"] and (not avance or c["propietario"] == params["propietario"])]
+        for c in tocados:
+            c.update(propietario=params["propietario"], actualizado_en=params["ahora"])
+            if avance:
+                c.update(ultimo_raw_id=params["rid"], estado=params["estado"])
+        return Resultado(None, rowcount=len(tocados))
+
+
+class Resultado:
+    def __init__(self, fila, rowcount=0):
+        self.fila = fila
+        self.rowcount = rowcount
+
+    def fetchone(self):
+        return self.fila
+
+
+def _checkpoint(id_, propietario, hace_segundos, ultimo_raw_id=0):
+    return {"id": id_, "modo": "completo", "estado": "en_curso", "propietario": propietario,
+            "ultimo_raw_id": ultimo_raw_id, "actualizado_en": datetime.utcnow() - timedelta(seconds=hace_segundos)}
+
+
+def test_solo_se_adopta_un_checkpoint_sin_latido():
+    """El checkpoint de una corrida viva no se toca; el de una caída pasa a la nueva corrida"""
+    viva = _checkpoint(2, "host:1:viva", hace_segundos=10, ultimo_raw_id=500)
+    caida = _checkpoint(1, "host:2:caida", hace_segundos=3600, ultimo_raw_id=300)
+    conn = ConexionCheckpoints([caida, viva])
+
+    fila = etl_pipeline._checkpoint_pendiente(conn, "completo", "host:3:nueva", vence_segundos=900)
+    assert fila == (1, 300, None)
+    assert caida["propietario"] == "host:3:nueva"
+    assert viva["propietario"] == "host:1:viva"
+    # Adoptado, ya tiene latido: otra corrida que arranca enseguida no lo toma
+    assert etl_pipeline._checkpoint_pendiente(conn, "completo", "host:4:otra", vence_segundos=900) is None
+
+
+def test_la_corrida_desplazada_no_avanza_el_checkpoint():
+    """Si otra corrida adoptó el checkpoint, el chunk de la anterior falla (y se deshace)"""
+    checkpoint = _checkpoint(1, "host:3:nueva", hace_segundos=0, ultimo_raw_id=300)
+    conn = ConexionCheckpoints([checkpoint])
+    with pytest.raises(RuntimeError):
+        etl_pipeline._guardar_checkpoint(conn, 1, "host:2:caida", 400, None, 100)
+    assert checkpoint["ultimo_raw_id"] == 300
+    etl_pipeline._guardar_checkpoint(conn, 1, "host:3:nueva", 400, None, 100)
+    assert checkpoint["ultimo_raw_id"] == 400
+
+
+def test_incremental_no_escribe_checkpoints(monkeypatch):
+    """El modo incremental retoma por etl_estado: ni abre ni avanza filas de etl_checkpoint"""
+    corrida = Corrida(monkeypatch, pendiente=(7, 4, None))
+    monkeypatch.setattr(etl_pipeline, "_abrir_checkpoint", lambda *args: pytest.fail("abrió un checkpoint"))
+    corrida.chunks = [[1, 2], [3]]
+    resumen = corrida.correr(incremental=True)
+    assert corrida.checkpoints == []
+    assert corrida.extracciones == [0]
+    assert resumen["checkpoint_id"] is None
+    assert resumen["total_chunks"] == 2
@@ -0,0 +1,210 @@
+"""
+Pruebas del orden de carga del ETL en modo paralelo (sin base de datos)
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+
+import pytest
+
+import etl_pipeline
+
+
+def _items(tabla, n=2):
+    return [{"id": i, "tabla_destino": tabla} for i in range(n)]
+
+
+def _chunk_todas_las_tablas():
+    cleaned = []
+    for etapa in etl_pipeline.ETAPAS_CARGA:
+        for tabla in etapa:
+            cleaned.extend(_items(tabla))
+    return cleaned
+
+
+@pytest.fixture
+def registro(monkeypatch):
+    """Reemplaza la carga real por un registro de (tabla, inicio, fin, conexión)."""
+    eventos = []
+    lock = threading.Lock()
+    conexiones_worker = []
+
+    @contextmanager
+    def begin():
+        conn = object()
+        with lock:
+            conexiones_worker.append(conn)
+        yield conn
+
+    class MotorFalso:
+        pass
+
+    motor = MotorFalso()
+    motor.begin = begin
+    monkeypatch.setattr(etl_pipeline, "engine", motor)
+
+    def cargar_tabla(conn, tabla, items, batch_size, cambiados=frozenset()):
+        inicio = time.perf_counter()
+        time.sleep(0.01)
+        with lock:
+            eventos.append({"tabla": tabla, "inicio": inicio, "fin": time.perf_counter(), "conn": conn})
+
+    monkeypatch.setattr(etl_pipeline, "_cargar_tabla", cargar_tabla)
+    return {"eventos": eventos, "conexiones_worker": conexiones_worker}
+
+
+def test_etapas_cubren_todas_las_tablas_destino():
+    """Cada tabla destino aparece exactamente en una etapa"""
+    tablas = [t for etapa in etl_pipeline.ETAPAS_CARGA for t in etapa]
+    assert sorted(tablas) == sorted(set(etl_pipeline.VALID_TYPES.values()))
+
+
+def test_paralelo_respeta_orden_entre_etapas(registro):
+    """Maestros terminan antes que facturas, y facturas antes que pagos"""
+    etl_pipeline._cargar_chunk(None, _chunk_todas_las_tablas(), batch_size=100, workers=4)
+    eventos = {e["tabla"]: e for e in registro["eventos"]}
+    assert len(eventos) == sum(len(e) for e in etl_pipeline.ETAPAS_CARGA)
+
+    for anterior, siguiente in zip(etl_pipeline.ETAPAS_CARGA, etl_pipeline.ETAPAS_CARGA[1:]):
+        fin_anterior = max(eventos[t]["fin"] for t in anterior)
+        inicio_siguiente = min(eventos[t]["inicio"] for t in siguiente)
+        assert fin_anterior <= inicio_siguiente
+
+
+def test_paralelo_usa_una_conexion_por_particion(registro):
+    """Cada partición se carga en su propia conexión, no en la transacción principal"""
+    principal = object()
+    etl_pipeline._cargar_chunk(principal, _chunk_todas_las_tablas(), batch_size=100, workers=4)
+    conexiones = [e["conn"] for e in registro["eventos"]]
+    assert principal not in conexiones
+    assert len(set(map(id, conexiones))) == len(conexiones)
+
+
+def test_tablas_de_una_etapa_corren_en_paralelo(monkeypatch, registro):
+    """facturas_venta y facturas_compra se cargan a la vez (la barrera solo se cruza si ambas corren)"""
+    barrera = threading.Barrier(2, timeout=5)
+
+    def cargar_tabla(conn, tabla, items, batch_size, cambiados=frozenset()):
+        barrera.wait()
+
+    monkeypatch.setattr(etl_pipeline, "_cargar_tabla", cargar_tabla)
+    cleaned = _items("facturas_venta") + _items("facturas_compra")
+    etl_pipeline._cargar_chunk(None, cleaned, batch_size=100, workers=2)
+
+
+def test_secuencial_usa_la_conexion_principal_en_orden(registro):
+    """Con un worker todo va por la conexión recibida y en el orden de ETAPAS_CARGA"""
+    principal = object()
+    etl_pipeline._cargar_chunk(principal, list(reversed(_chunk_todas_las_tablas())), batch_size=100, workers=1)
+    orden = [e["tabla"] for e in registro["eventos"]]
+    assert orden == [t for etapa in etl_pipeline.ETAPAS_CARGA for t in etapa]
+    assert all(e["conn"] is principal for e in registro["eventos"])
+    assert registro["conexiones_worker"] == []
+
+
+def test_error_en_una_etapa_no_ejecuta_las_siguientes(monkeypatch, registro):
+    """Si falla la carga de facturas, los pagos no se cargan y el error se propaga"""
+    cargadas = []
+
+    def cargar_tabla(conn, tabla, items, batch_size, cambiados=frozenset()):
+        if tabla == "facturas_venta":
+            raise ValueError("factura inválida")
+        cargadas.append(tabla)
+
+    monkeypatch.setattr(etl_pipeline, "_cargar_tabla", cargar_tabla)
+    with pytest.raises(ValueError):
+        etl_pipeline._cargar_chunk(None, _chunk_todas_las_tablas(), batch_size=100, workers=4)
+    assert "pagos_recibidos" not in cargadas
+    assert "pagos_proveedor" not in cargadas
+
+
+def test_filas_se_toman_en_su_transaccion_antes_de_cargar(monkeypatch):
+    """El lease se confirma antes de la carga paralela: la transacción principal no retiene locks de raw_data"""
+    leido = datetime(2025, 1, 1, 10, 0)
+    sentencias = []
+    abiertas = []
+
+    class ConexionToma:
+        def execute(self, sql, params):
+            sentencias.append((" ".join(str(sql).split()), params))
+            # La fila 2 se editó después de la extracción
+            return type("R", (), {"fetchall": lambda self: [(1, leido), (2, datetime(2025, 1, 1, 10, 5))]})()
+
+    @contextmanager
+    def begin():
+        abiertas.append(True)
+        yield ConexionToma()
+        abiertas.pop()
+
+    monkeypatch.setattr(etl_pipeline, "engine", type("Engine", (), {"begin": staticmethod(begin)}))
+    cargas = []
+    marcadas = []
+
+    def cargar_chunk(conn, cleaned, batch_size, cambiados=frozenset(), workers=1):
+        cargas.append({"ids": [c["id"] for c in cleaned], "transacciones_de_toma": len(abiertas)})
+        return []
+
+    monkeypatch.setattr(etl_pipeline, "_cargar_chunk", cargar_chunk)
+    monkeypatch.setattr(etl_pipeline, "_hashes_previos", lambda conn, ids: {})
+    monkeypatch.setattr(etl_pipeline, "_upsert_cleaned", lambda conn, cleaned, batch_size: None)
+    monkeypatch.setattr(etl_pipeline, "_liberar_dead_letter", lambda conn, ids: None)
+    monkeypatch.setattr(etl_pipeline, "_guardar_hashes", lambda conn, hashes, batch_size: None)
+    monkeypatch.setattr(etl_pipeline, "_marcar_procesadas",
+                        lambda conn, ids, propietario: marcadas.append((set(ids), propietario)))
+
+    columns = ["id", "tipo", "descripcion", "monto", "fecha", "creado_en", "actualizado_en", "metadata_json"]
+    rows = [(rid, "ingreso", "Acme - Venta", 10, date(2025, 1, 1), leido, leido, None) for rid in (1, 2)]
+    estado = etl_pipeline._estado_corrida()
+    etl_pipeline._procesar_chunk(object(), columns, rows, estado, None, 100, 4, "host:1:corrida")
+
+    assert cargas == [{"ids": [1], "transacciones_de_toma": 0}]
+    assert "FOR UPDATE SKIP LOCKED" in sentencias[0][0]
+    assert sentencias[1][0].startswith("UPDATE raw_data SET etl_estado = 'en_proceso'")
+    assert sentencias[1][1]["ids"] == [1] and sentencias[1][1]["owner"] == "host:1:corrida"
+    assert estado["conteo"]["ocupadas"] == 1
+    assert marcadas == [({1}, "host:1:corrida")]
+
+
+def test_corrida_completa_sin_cambios_no_escribe_en_raw_data(monkeypatch):
+    """La segunda corrida completa sobre datos sin cambios no toma ni marca filas: ningún UPDATE a raw_data"""
+    leido = datetime(2025, 1, 1, 10, 0)
+    sentencias = []
+    guardados = {}
+
+    class Conexion:
+        def execute(self, sql, params=None):
+            sentencias.append(" ".join(str(sql).split()))
+            ids = params.get("ids", []) if isinstance(params, dict) else []
+            return type("R", (), {"fetchall": lambda self: [(rid, leido) for rid in ids]})()
+
+    @contextmanager
+    def begin():
+        yield Conexion()
+
+    monkeypatch.setattr(etl_pipeline, "engine", type("Engine", (), {"begin": staticmethod(begin)}))
+    monkeypatch.setattr(etl_pipeline, "_hashes_previos",
+                        lambda conn, ids: {i: guardados[i] for i in ids if i in guardados})
+    monkeypatch.setattr(etl_pipeline, "_guardar_hashes",
+                        lambda conn, hashes, batch_size: guardados.update((h["rid"], h["hash"]) for h in hashes))
+    monkeypatch.setattr(etl_pipeline, "_cargar_chunk", lambda conn, cleaned, *args, **kwargs: [])
+
+    columns = ["id", "tipo", "descripcion", "monto", "fecha", "creado_en", "actualizado_en", "metadata_json",
+               "etl_estado"]
+
+    def corrida(etl_estado):
+        sentencias.clear()
+        rows = [(rid, "ingreso", "Acme - Venta", 10, date(2025, 1, 1), leido, leido, None, etl_estado)
+                for rid in (1, 2)]
+        estado = etl_pipeline._estado_corrida()
+        etl_pipeline._procesar_chunk(Conexion(), columns, rows, estado, None, 100, 1, "host:1:corrida")
+        return estado["conteo"], [s for s in sentencias if s.startswith("UPDATE raw_data")]
+
+    conteo, updates = corrida("pendiente")
+    assert conteo["nuevos"] == 2 and len(updates) == 2  # en_proceso y procesado
+
+    conteo, updates = corrida("procesado")
+    assert conteo["sin_cambios"] == 2
+    assert updates == []
+    assert not any("FOR UPDATE" in s for s in sentencias)
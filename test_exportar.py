@@ -0,0 +1,51 @@
+"""
+Pruebas de la exportación en streaming (SQLite en memoria, sin MySQL)
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+import exportar
+import models
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.FacturaVenta.__table__.create(engine)
+    with Session(engine) as db:
+        for i in range(1, 6):
+            db.add(models.FacturaVenta(cliente=f"Cliente {i}", descripcion="Venta", monto=Decimal("10.50") * i,
+                                       fecha=date(2025, 1, i), creado_en=datetime(2025, 1, i), raw_id=i))
+        db.commit()
+    monkeypatch.setattr(exportar, "engine", engine)
+    return engine
+
+
+def test_ndjson_emite_un_bloque_por_chunk(engine):
+    bloques = list(exportar.exportar("facturas_venta", "ndjson", chunk_size=2))
+    assert len(bloques) == 3
+    filas = [json.loads(linea) for linea in b"".join(bloques).splitlines()]
+    assert [f["id"] for f in filas] == [1, 2, 3, 4, 5]
+    assert filas[1]["monto"] == 21.0
+    assert filas[1]["fecha"] == "2025-01-02"
+
+
+def test_csv_con_encabezado_y_rango_de_fechas(engine):
+    contenido = "".join(exportar.exportar("facturas_venta", "csv", desde=date(2025, 1, 2), hasta=date(2025, 1, 3)))
+    filas = list(csv.DictReader(io.StringIO(contenido)))
+    assert [f["cliente"] for f in filas] == ["Cliente 2", "Cliente 3"]
+    assert filas[0]["monto"] == "21.00"
+
+
+def test_csv_vacio_solo_trae_encabezado(engine):
+    contenido = "".join(exportar.exportar("facturas_venta", "csv", desde=date(2026, 1, 1)))
+    assert contenido.strip().split(",")[:2] == ["id", "cliente"]
@@ -0,0 +1,77 @@
+"""
+Pruebas de Idempotency-Key en los POST de ingesta (SQLite en memoria, sin MySQL)
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import idempotencia
+import models
+
+
+@pytest.fixture
+def sesiones():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.RawData.__table__.create(engine)
+    models.IdempotencyKey.__table__.create(engine)
+    return sessionmaker(bind=engine)
+
+
+def _crear(db, clave, payload):
+    """Lo que hace un endpoint de ingesta: fila en raw_data + respuesta con su raw_id."""
+    previa = idempotencia.buscar(db, clave, "/api/raw/", payload)
+    if previa is not None:
+        return previa
+    raw = models.RawData(tipo="ingreso", descripcion=payload["descripcion"], monto=10, fecha=datetime(2025, 1, 1))
+    db.add(raw)
+    db.flush()
+    return idempotencia.confirmar(db, clave, "/api/raw/", payload, {"raw_id": raw.id})
+
+
+def test_reintento_devuelve_la_respuesta_original_sin_insertar(sesiones):
+    payload = {"descripcion": "Acme - Venta"}
+    with sesiones() as db:
+        assert _crear(db, "k-1", payload) == {"raw_id": 1}
+    with sesiones() as db:
+        repetida = _crear(db, "k-1", payload)
+        assert repetida.status_code == 201
+        assert repetida.body == b'{"raw_id":1}'
+        assert repetida.headers["Idempotent-Replayed"] == "true"
+        assert db.query(models.RawData).count() == 1
+
+
+def test_misma_clave_con_otro_cuerpo_es_error(sesiones):
+    with sesiones() as db:
+        _crear(db, "k-1", {"descripcion": "Acme - Venta"})
+    with sesiones() as db, pytest.raises(HTTPException) as error:
+        _crear(db, "k-1", {"descripcion": "Beta - Venta"})
+    assert error.value.status_code == 422
+
+
+def test_carrera_entre_reintentos_descarta_la_segunda_fila(sesiones):
+    """Dos peticiones con la misma clave pasan la búsqueda; la que confirma segunda se deshace"""
+    payload = {"descripcion": "Acme - Venta"}
+    primera, segunda = sesiones(), sesiones()
+    assert idempotencia.buscar(primera, "k-1", "/api/raw/", payload) is None
+    assert idempotencia.buscar(segunda, "k-1", "/api/raw/", payload) is None
+    assert _crear(primera, "k-1", payload) == {"raw_id": 1}
+    repetida = _crear(segunda, "k-1", payload)
+    assert repetida.body == b'{"raw_id":1}'
+    assert segunda.query(models.RawData).count() == 1
+    primera.close(), segunda.close()
+
+
+def test_clave_vencida_se_reemplaza_y_se_purga(sesiones):
+    with sesiones() as db:
+        _crear(db, "k-1", {"descripcion": "Acme - Venta"})
+        db.query(models.IdempotencyKey).update({"expira_en": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        assert _crear(db, "k-1", {"descripcion": "Beta - Venta"}) == {"raw_id": 2}
+        db.query(models.IdempotencyKey).update({"expira_en": datetime.utcnow() - timedelta(seconds=1)})
+        db.commit()
+        assert idempotencia.purgar_vencidas(db) == 1
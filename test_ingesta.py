@@ -0,0 +1,67 @@
+"""
+Pruebas de la carga masiva de raw_data (SQLite en memoria, sin MySQL)
+"""
+
+import json
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import ingesta
+import models
+from schemas import RawEntryIn
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    models.RawData.__table__.create(engine)
+    with sessionmaker(bind=engine)() as sesion:
+        yield sesion
+
+
+def test_formatos_dan_las_mismas_filas():
+    esperado = [{"tipo": "ingreso", "descripcion": "Acme - Venta", "monto": "10", "fecha": "2025-01-01"}]
+    assert ingesta.leer_filas(json.dumps(esperado).encode(), "application/json") == esperado
+    ndjson = (json.dumps(esperado[0]) + "\n\n").encode()
+    assert ingesta.leer_filas(ndjson, "application/x-ndjson") == esperado
+    csv = "tipo,descripcion,monto,fecha\r\ningreso,Acme - Venta,10,2025-01-01\r\n".encode()
+    assert ingesta.leer_filas(csv, "text/csv; charset=utf-8") == esperado
+    with pytest.raises(HTTPException) as error:
+        ingesta.leer_filas(b"{}", "application/json")
+    assert error.value.status_code == 400
+
+
+def test_ids_por_fila_en_orden_con_errores_intercalados(db):
+    filas = [
+        {"tipo": "Ingreso", "descripcion": " Acme - Venta 1 ", "monto": 10, "fecha": "2025-01-01"},
+        {"tipo": "ingreso", "descripcion": "Sin monto", "fecha": "2025-01-01"},
+        ValueError("Expecting value"),
+        {"tipo": "gasto", "descripcion": "Beta - Compra", "monto": 5, "fecha": "2025-01-02"},
+        {"tipo": "pago_recibido", "descripcion": "1-Abono", "monto": 3, "fecha": "2025-01-03"},
+    ]
+    resumen = ingesta.ingestar(db, filas, RawEntryIn, lote=2)
+    assert (resumen["insertadas"], resumen["errores"]) == (3, 2)
+    resultados = resumen["resultados"]
+    assert [r["fila"] for r in resultados] == [0, 1, 2, 3, 4]
+    assert "monto" in resultados[1]["error"] and "JSON" in resultados[2]["error"]
+    ids = [resultados[i]["raw_id"] for i in (0, 3, 4)]
+    guardadas = {r.id: r for r in db.query(models.RawData)}
+    assert [guardadas[i].descripcion for i in ids] == ["Acme - Venta 1", "Beta - Compra", "1-Abono"]
+    assert guardadas[ids[0]].tipo == "ingreso"
+    assert guardadas[ids[1]].tabla_destino == "facturas_compra"
+    assert guardadas[ids[0]].etl_estado == "pendiente"
+
+
+def test_valida_con_el_esquema_de_la_api():
+    """Un tipo fuera de la lista de RawEntryIn queda como error de su fila, sin llegar al INSERT"""
+    filas = [
+        {"tipo": "otro", "descripcion": "Acme", "monto": 1, "fecha": "2025-01-01"},
+        {"tipo": "GASTO", "descripcion": "Beta", "monto": 2, "fecha": "2025-01-02"},
+    ]
+    validas, resultados = ingesta.validar(filas, RawEntryIn)
+    assert "tipo inválido" in resultados[0]["error"]
+    assert [(i, fila["tipo"]) for i, fila in validas] == [(1, "gasto")]
@@ -0,0 +1,39 @@
+"""
+Pruebas de las métricas por etapa del ETL (sin base de datos)
+"""
+
+import sys
+
+import pytest
+
+import metricas
+
+
+def test_memoria_por_etapa_no_arrastra_el_pico_anterior(monkeypatch):
+    """Una etapa liviana después de una pesada reporta su propia RSS, no el pico de la pesada"""
+    lecturas = iter([100.0, 400.0,   # carga: crece 300 MB
+                     150.0, 160.0])  # hashes: ya se liberó la memoria de la carga
+    monkeypatch.setattr(metricas, "memoria_actual_mb", lambda: next(lecturas))
+    medicion = metricas.MetricasEtl()
+    with medicion.activar():
+        with metricas.etapa("carga_facturas_venta", 10):
+            pass
+        with metricas.etapa("hashes", 10):
+            pass
+    etapas = medicion.resumen()["etapas"]
+    assert (etapas["carga_facturas_venta"]["rss_mb"], etapas["carga_facturas_venta"]["rss_delta_mb"]) == (400.0, 300.0)
+    assert (etapas["hashes"]["rss_mb"], etapas["hashes"]["rss_delta_mb"]) == (160.0, 10.0)
+
+
+def test_sin_lectura_de_memoria_quedan_en_none(monkeypatch):
+    monkeypatch.setattr(metricas, "memoria_actual_mb", lambda: None)
+    medicion = metricas.MetricasEtl()
+    with medicion.activar(), metricas.etapa("limpieza", 5):
+        pass
+    etapa = medicion.resumen()["etapas"]["limpieza"]
+    assert etapa["rss_mb"] is None and etapa["rss_delta_mb"] is None and etapa["filas"] == 5
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="/proc/self/statm solo existe en Linux")
+def test_memoria_actual_en_linux():
+    assert 0 < metricas.memoria_actual_mb() <= metricas.pico_memoria_mb() + 1
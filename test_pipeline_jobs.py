@@ -0,0 +1,72 @@
+"""
+Pruebas de los trabajos asíncronos del pipeline (sin base de datos)
+"""
+
+import threading
+import time
+
+import pytest
+
+import etl_pipeline
+import pipeline_jobs
+
+
+def _esperar(trabajo_id, estados=("completado", "error"), timeout=5):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        trabajo = pipeline_jobs.obtener(trabajo_id)
+        if trabajo["estado"] in estados:
+            return trabajo
+        time.sleep(0.01)
+    raise AssertionError(f"el trabajo {trabajo_id} no llegó a {estados}")
+
+
+@pytest.fixture
+def etl_bloqueado(monkeypatch):
+    """run_etl falso que espera una señal y reporta progreso antes de terminar."""
+    liberar = threading.Event()
+    corridas = []
+
+    def run_etl(incremental=False, progreso=None):
+        corridas.append(incremental)
+        progreso({"chunks": 1, "filas_leidas": 10})
+        liberar.wait(5)
+        return {"total_cleaned": 10}
+
+    monkeypatch.setattr(etl_pipeline, "run_etl", run_etl)
+    yield liberar, corridas
+    liberar.set()
+
+
+def test_solicitudes_concurrentes_se_unen_al_trabajo_en_cola(etl_bloqueado):
+    """Con una corrida en curso, varias solicitudes nuevas comparten un solo trabajo en cola"""
+    liberar, corridas = etl_bloqueado
+    primero, _ = pipeline_jobs.encolar()
+    en_curso = _esperar(primero["id"], estados=("en_curso",))
+    assert en_curso["progreso"] == {"chunks": 1, "filas_leidas": 10}
+
+    segundo, coalescido_2 = pipeline_jobs.encolar()
+    tercero, coalescido_3 = pipeline_jobs.encolar()
+    assert not coalescido_2 and coalescido_3
+    assert segundo["id"] == tercero["id"] != primero["id"]
+    assert pipeline_jobs.obtener(segundo["id"])["solicitudes"] == 2
+
+    liberar.set()
+    assert _esperar(primero["id"])["resultado"] == {"total_cleaned": 10}
+    assert _esperar(segundo["id"])["estado"] == "completado"
+    assert corridas == [True, True]
+
+
+def test_error_del_etl_queda_en_el_trabajo(monkeypatch):
+    def run_etl(incremental=False, progreso=None):
+        raise RuntimeError("sin conexión")
+
+    monkeypatch.setattr(etl_pipeline, "run_etl", run_etl)
+    trabajo, _ = pipeline_jobs.encolar(incremental=False)
+    terminado = _esperar(trabajo["id"])
+    assert terminado["estado"] == "error"
+    assert "sin conexión" in terminado["error"]
+
+
+def test_trabajo_inexistente():
+    assert pipeline_jobs.obtener("no-existe") is None
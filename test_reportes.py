@@ -0,0 +1,57 @@
+"""
+Pruebas de los agregados del dashboard (SQLite en memoria, sin MySQL)
+"""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+import models
+import reportes
+
+HOY = date(2025, 3, 15)
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    models.FacturaVenta.__table__.create(engine)
+    with Session(engine) as db:
+        for i, (fecha, monto) in enumerate([
+            (date(2024, 1, 10), "999.00"),  # fuera de la ventana de 12 meses
+            (date(2025, 1, 5), "100.00"),
+            (date(2025, 2, 20), "50.00"),
+            (date(2025, 3, 1), "30.00"),
+            (date(2025, 3, 14), "20.00"),
+        ], start=1):
+            db.add(models.FacturaVenta(cliente="Acme", descripcion="Venta", monto=Decimal(monto), fecha=fecha,
+                                       raw_id=i))
+        db.commit()
+        yield db
+
+
+def test_resumen_mensual(db):
+    resumen = reportes.resumen_mensual(db, "venta", meses=12, hoy=HOY)
+    assert resumen["total_mes"] == 50.0
+    assert resumen["total_30d"] == 100.0
+    assert resumen["cantidad"] == 5
+    assert resumen["promedio"] == pytest.approx(239.8)
+
+    meses = resumen["meses"]
+    assert len(meses) == 12
+    assert meses[0] == {"mes": "2024-04", "total": 0.0, "cantidad": 0}
+    assert meses[-3:] == [
+        {"mes": "2025-01", "total": 100.0, "cantidad": 1},
+        {"mes": "2025-02", "total": 50.0, "cantidad": 1},
+        {"mes": "2025-03", "total": 50.0, "cantidad": 2},
+    ]
+
+
+def test_resumen_mensual_sin_facturas(db):
+    db.query(models.FacturaVenta).delete()
+    resumen = reportes.resumen_mensual(db, "venta", meses=2, hoy=date(2025, 1, 31))
+    assert resumen["total_mes"] == 0.0 and resumen["promedio"] == 0.0 and resumen["cantidad"] == 0
+    assert [m["mes"] for m in resumen["meses"]] == ["2024-12", "2025-01"]
@@ -0,0 +1,132 @@
+"""
+Pruebas de la cadena de respaldos: snapshot completo + deltas y restauración (SQLite, sin MySQL)
+"""
+
+import csv
+
+import pytest
+from sqlalchemy import create_engine, text
+
+import respaldos
+
+COLUMNAS = ["id", "tipo", "descripcion", "monto"]
+
+
+@pytest.fixture
+def backups(tmp_path, monkeypatch):
+    monkeypatch.setattr(respaldos, "BACKUP_DIR", str(tmp_path))
+    monkeypatch.setattr(respaldos, "MANIFEST", str(tmp_path / "manifest.json"))
+    monkeypatch.setattr(respaldos, "ETL_BACKUP_FULL_EVERY", 2)
+    return tmp_path
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE raw_data (id INTEGER PRIMARY KEY, tipo TEXT, descripcion TEXT, monto TEXT)"))
+        conn.execute(text("""
+            INSERT INTO raw_data VALUES
+              (1, 'ingreso', 'Acme - Venta', '10.00'),
+              (2, 'gasto', 'Beta - Compra', '20.00'),
+              (3, 'ingreso', 'Gamma - Venta', '30.00')
+        """))
+    return engine
+
+
+def _delta(timestamp, rows):
+    respaldo = respaldos.Respaldo(timestamp, modo="delta")
+    respaldo.escribir_raw(COLUMNAS, rows)
+    return respaldo.cerrar()
+
+
+def _leer(ruta):
+    with open(ruta, newline="", encoding="utf-8") as f:
+        return {int(fila["id"]): fila for fila in csv.DictReader(f)}
+
+
+def test_restaurar_snapshot_mas_deltas(backups, engine):
+    """Los deltas se aplican en orden sobre el snapshot: gana la última versión de cada id"""
+    base = respaldos.snapshot_completo(engine, "20250101_000000", chunk_size=2)
+    raw_1, _ = _delta("20250101_010000", [(2, "gasto", "Beta - Compra editada", "25.00"), (4, "gasto", "Zeta", "5.00")])
+    raw_2, _ = _delta("20250101_020000", [(2, "gasto", "Beta - Compra corregida", "26.00")])
+
+    entradas = respaldos.leer_manifest()
+    assert [e["tipo"] for e in entradas] == ["completo", "delta", "delta"]
+    assert entradas[0]["max_raw_id"] == 3 and entradas[0]["filas"] == 3
+    assert entradas[1]["base"] == base and entradas[1]["anterior"] == base
+    assert entradas[2]["base"] == base and entradas[2]["anterior"] == raw_1
+    assert entradas[2]["archivo"] == raw_2 and entradas[1]["max_raw_id"] == 4
+
+    destino = backups / "restaurado.csv"
+    assert respaldos.restaurar(str(destino)) == 4
+    filas = _leer(destino)
+    assert filas[2]["descripcion"] == "Beta - Compra corregida"
+    assert filas[2]["monto"] == "26.00"
+    assert filas[4]["descripcion"] == "Zeta"
+    assert filas[1]["descripcion"] == "Acme - Venta"
+
+    # Hasta el primer delta: la fila 2 queda con su primera edición
+    assert respaldos.restaurar(str(destino), hasta="20250101_010000") == 4
+    assert _leer(destino)[2]["descripcion"] == "Beta - Compra editada"
+
+
+def test_restaurar_sin_snapshot_completo(backups):
+    _delta("20250101_010000", [(1, "ingreso", "Acme - Venta", "10.00")])
+    with pytest.raises(ValueError):
+        respaldos.restaurar(str(backups / "restaurado.csv"))
+
+
+def test_toca_snapshot_completo(backups, engine):
+    """Sin base toca snapshot; con base, recién al acumular ETL_BACKUP_FULL_EVERY deltas"""
+    assert respaldos.toca_snapshot_completo()
+    respaldos.snapshot_completo(engine, "20250101_000000")
+    assert not respaldos.toca_snapshot_completo()
+    _delta("20250101_010000", [(1, "ingreso", "Acme - Venta", "11.00")])
+    assert not respaldos.toca_snapshot_completo()
+    _delta("20250101_020000", [(1, "ingreso", "Acme - Venta", "12.00")])
+    assert respaldos.toca_snapshot_completo()
+
+
+def test_cerrar_sin_filas_no_registra(backups):
+    """Un respaldo sin filas no crea archivos ni entra al manifiesto"""
+    respaldo = respaldos.Respaldo("20250101_010000", modo="delta")
+    respaldo.escribir_raw(COLUMNAS, [])
+    assert respaldo.cerrar() == (None, None)
+    assert respaldos.leer_manifest() == []
+    assert list(backups.iterdir()) == []
+
+
+def test_ventana_junta_varias_corridas_en_un_delta(backups):
+    """Las corridas de una misma ventana escriben en un solo delta; al vencer se encadena y se abre otro"""
+    reloj = [0.0]
+    ventana = respaldos.VentanaRespaldo(600, reloj=lambda: reloj[0])
+    for rid in (1, 2, 3):
+        ventana.actual().escribir_raw(COLUMNAS, [(rid, "ingreso", "Acme - Venta", "10.00")])
+        reloj[0] += 100
+    assert ventana.rotar() == (None, None)
+    assert respaldos.leer_manifest() == []
+
+    reloj[0] = 600
+    raw_file, _ = ventana.rotar()
+    entradas = respaldos.leer_manifest()
+    assert [(e["archivo"], e["filas"], e["max_raw_id"]) for e in entradas] == [(raw_file, 3, 3)]
+
+    # Sin filas en la ventana nueva no se registra nada, ni siquiera forzando
+    ventana.actual()
+    assert ventana.rotar(forzar=True) == (None, None)
+    assert len(respaldos.leer_manifest()) == 1
+
+
+def test_ventanas_de_dos_procesos_no_comparten_archivo(backups, monkeypatch):
+    """Dos workers que abren su ventana en el mismo segundo escriben archivos distintos y los dos entran al manifiesto"""
+    archivos = []
+    for pid in (101, 102):
+        monkeypatch.setattr(respaldos.os, "getpid", lambda pid=pid: pid)
+        ventana = respaldos.VentanaRespaldo(600)
+        ventana.actual().escribir_raw(COLUMNAS, [(pid, "ingreso", "Acme - Venta", "10.00")])
+        archivos.append(ventana.rotar(forzar=True)[0])
+    assert archivos[0] != archivos[1]
+    entradas = respaldos.leer_manifest()
+    assert [e["archivo"] for e in entradas] == archivos
+    assert entradas[1]["anterior"] == archivos[0]
@@ -0,0 +1,35 @@
+"""
+Pruebas de los serializadores precompilados y de la proyección con fields=
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+
+import models
+import serializadores
+
+
+def test_objeto_y_tupla_dan_el_mismo_dict():
+    fv = models.FacturaVenta(id=7, cliente="Acme", descripcion="Venta", monto=Decimal("10.50"),
+                             fecha=date(2025, 1, 2), creado_en=datetime(2025, 1, 2, 8, 30), raw_id=3)
+    ser = serializadores.de(models.FacturaVenta)
+    esperado = {"id": 7, "cliente": "Acme", "descripcion": "Venta", "monto": 10.5, "fecha": "2025-01-02",
+                "creado_en": "2025-01-02T08:30:00", "raw_id": 3}
+    assert ser.objeto(fv) == esperado
+    assert ser.fila((7, "Acme", "Venta", Decimal("10.50"), date(2025, 1, 2), datetime(2025, 1, 2, 8, 30), 3)) == esperado
+
+
+def test_proyeccion_conserva_la_clave_primaria():
+    ser = serializadores.proyectar(models.PagoRecibido, "monto, fecha")
+    assert ser.nombres == ("id", "monto", "fecha")
+    assert ser.fila((1, None, date(2025, 1, 1))) == {"id": 1, "monto": None, "fecha": "2025-01-01"}
+    assert serializadores.proyectar(models.EtlDeadLetter, "error").nombres[0] == "raw_id"
+
+
+def test_proyeccion_con_campo_desconocido_es_error():
+    with pytest.raises(HTTPException) as error:
+        serializadores.proyectar(models.Cliente, "nombre,clave")
+    assert error.value.status_code == 400